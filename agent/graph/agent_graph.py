@@ -11,6 +11,7 @@ from langchain_core.messages import (
     SystemMessage,
     ToolMessage,
 )
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import END, StateGraph
 from langgraph.prebuilt import ToolNode
 
@@ -66,7 +67,7 @@ def _format_tip(result: str) -> str:
         return result
 
 
-def our_agent(state: AgentState) -> AgentState:
+def our_agent(state: AgentState, config: RunnableConfig) -> AgentState:
     # Intercept daily tip requests and force tool usage
     if state["messages"]:
         last_user = _last_user_text(state["messages"])
@@ -101,7 +102,8 @@ def our_agent(state: AgentState) -> AgentState:
     )
 
     llm = get_llm(temperature=0.2).bind_tools(tools)
-    response = llm.invoke([system] + list(state["messages"]))
+    # Passing the run config on lets astream_events stream this call's tokens
+    response = llm.invoke([system] + list(state["messages"]), config)
     return {"messages": list(state["messages"]) + [response]}
 
 
@@ -1,5 +1,5 @@
 import json
-from typing import Any, Dict, List
+from typing import Any, AsyncIterator, Dict, List, Set, Tuple
 
 from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
 
@@ -75,14 +75,7 @@ class AdviceModel:
         Returns:
             Personalized financial advice text
         """
-        # Create initial state with user's transaction data
-        user_message = f"""Please analyze my transactions and provide financial advice.
-Here are my recent transactions: {json.dumps(transactions, indent=2)}"""
-
-        init_msg = HumanMessage(content="Dataset loaded and ready.")
-        user_msg = HumanMessage(content=user_message)
-
-        state: AgentState = {"messages": [init_msg, user_msg]}
+        state = AdviceModel._initial_state(transactions)
 
         # Invoke the agent
         final_state = agent_app.invoke(state)
@@ -92,20 +85,87 @@ Here are my recent transactions: {json.dumps(transactions, indent=2)}"""
 
         return advice.strip() if advice else "Unable to generate advice at this time."
 
+    @staticmethod
+    async def stream_financial_advice(
+        user_uuid: str, transactions: List[Dict[str, Any]]
+    ) -> AsyncIterator[Tuple[str, str]]:
+        """
+        Generate advice like `generate_financial_advice`, yielding the text as
+        the LLM produces it instead of after the whole graph has run.
+
+        Tokens come from the agent node's chat model calls. A call that streams
+        tool calls is skipped from then on, but text it wrote before them has
+        already gone out, so the tokens can hold more than the final advice.
+        Tool results and LLM calls made by tools are not streamed. The last
+        item is the final advice itself, exactly what
+        `generate_financial_advice` returns; if no token was streamed (e.g. the
+        answer was built without the LLM), it is also yielded as one token.
+
+        Args:
+            user_uuid: Unique identifier for the user
+            transactions: List of transaction dictionaries
+
+        Yields:
+            ("token", text) pieces in order, then ("advice", text)
+        """
+        state = AdviceModel._initial_state(transactions)
+        streamed = False
+        tool_call_runs: Set[str] = set()
+        final_messages: List[BaseMessage] = []
+
+        async for event in agent_app.astream_events(state, version="v2"):
+            if (
+                event["event"] == "on_chat_model_stream"
+                and event["metadata"].get("langgraph_node") == "agent"
+            ):
+                chunk = event["data"]["chunk"]
+                if getattr(chunk, "tool_call_chunks", None):
+                    tool_call_runs.add(event["run_id"])
+                if event["run_id"] in tool_call_runs:
+                    continue
+                text = AdviceModel._content_text(chunk.content)
+                if text:
+                    streamed = True
+                    yield "token", text
+            elif event["event"] == "on_chain_end" and not event["parent_ids"]:
+                # End of the graph run itself
+                final_messages = list(event["data"]["output"]["messages"])
+
+        advice = AdviceModel._get_last_ai_message(final_messages).strip()
+        advice = advice or "Unable to generate advice at this time."
+        if not streamed:
+            yield "token", advice
+        yield "advice", advice
+
+    @staticmethod
+    def _initial_state(transactions: List[Dict[str, Any]]) -> AgentState:
+        """Create initial state with user's transaction data."""
+        user_message = f"""Please analyze my transactions and provide financial advice.
+Here are my recent transactions: {json.dumps(transactions, indent=2)}"""
+
+        init_msg = HumanMessage(content="Dataset loaded and ready.")
+        user_msg = HumanMessage(content=user_message)
+
+        return {"messages": [init_msg, user_msg]}
+
     @staticmethod
     def _get_last_ai_message(messages: List[BaseMessage]) -> str:
         """Return the most recent AI message content."""
         for m in reversed(messages):
             if isinstance(m, AIMessage):
-                content = m.content
-                if isinstance(content, str):
-                    return content
-                elif isinstance(content, list):
-                    # If content is a list, join string elements and ignore dicts
-                    str_items = [item for item in content if isinstance(item, str)]
-                    return "\n".join(str_items)
-                # If content is neither str nor list, fallback to empty string
-                return ""
+                return AdviceModel._content_text(m.content)
+        return ""
+
+    @staticmethod
+    def _content_text(content: Any) -> str:
+        """Return the text of a message (or message chunk) content."""
+        if isinstance(content, str):
+            return content
+        elif isinstance(content, list):
+            # If content is a list, join string elements and ignore dicts
+            str_items = [item for item in content if isinstance(item, str)]
+            return "\n".join(str_items)
+        # If content is neither str nor list, fallback to empty string
         return ""
 
 
@@ -1,19 +1,62 @@
+import json
 import logging
 import os
 import traceback
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
 
 import requests
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import Response
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import StreamingResponse
 
 from models import AdviceModel, TransactionModel
 from schemas import GetFinancialAdviceRequest
 
 router = APIRouter(prefix="/api", tags=["advice"])
 
+AUDIO_CHUNK_SIZE = 64 * 1024
+
+
+def _iter_audio(audio_response: requests.Response) -> Iterator[bytes]:
+    """Yield the TTS audio as it downloads; runs in Starlette's threadpool."""
+    try:
+        yield from audio_response.iter_content(chunk_size=AUDIO_CHUNK_SIZE)
+    finally:
+        audio_response.close()
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _iter_advice_events(
+    user_uuid: str, transactions: List[Dict[str, Any]]
+) -> AsyncIterator[str]:
+    """Server-sent events: `token` events with the advice text as the LLM
+    writes it, then `done` with the final advice (as the JSON response would
+    have it), or `error` if generation fails part way."""
+    advice = ""
+    try:
+        async for kind, text in AdviceModel.stream_financial_advice(
+            user_uuid, transactions
+        ):
+            if kind == "token":
+                yield _sse("token", {"text": text})
+            else:
+                advice = text
+    except Exception as e:
+        logging.error(
+            f"500 Error streaming advice for user {user_uuid}: {str(e)}\n"
+            f"{traceback.format_exc()}"
+        )
+        yield _sse("error", {"detail": f"Failed to generate advice: {str(e)}"})
+        return
+    yield _sse("done", {"advice": advice})
+
 
 @router.post("/advice", response_model=None)
-async def get_financial_advice(request: GetFinancialAdviceRequest):
+async def get_financial_advice(
+    request: GetFinancialAdviceRequest, accept: Optional[str] = Header(None)
+):
     """
     Generate personalized financial advice based on user's transaction records.
 
@@ -22,10 +65,12 @@ async def get_financial_advice(request: GetFinancialAdviceRequest):
 
     Args:
         request: Request containing user UUID, list of transactions, and output format
+        accept: `text/event-stream` streams text advice as server-sent events
 
     Returns:
-        For text format: JSON string containing the advice text
-        For audio format: Response object with MP3 audio content
+        For text format: JSON string containing the advice text, or a
+            StreamingResponse of `token`/`done`/`error` events when requested
+        For audio format: StreamingResponse relaying the MP3 audio as it downloads
 
     Raises:
         HTTPException: If transaction validation fails or advice generation fails
@@ -41,6 +86,13 @@ async def get_financial_advice(request: GetFinancialAdviceRequest):
                 detail="Invalid transaction data: transactions must have positive amounts and required fields",
             )
 
+        if request.output_format == "text" and "text/event-stream" in (accept or ""):
+            return StreamingResponse(
+                _iter_advice_events(request.user_uuid, transactions_dict),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache"},
+            )
+
         # Generate advice using the business logic model
         advice = AdviceModel.generate_financial_advice(
             request.user_uuid, transactions_dict
@@ -91,17 +143,22 @@ async def get_financial_advice(request: GetFinancialAdviceRequest):
 
             if "AudioContent" in response_data:
                 raise Exception("Unexpected response format from UnrealSpeech API")
-            audio_response = requests.get(response_data["OutputUri"], timeout=60)
+            audio_response = requests.get(
+                response_data["OutputUri"], stream=True, timeout=60
+            )
             audio_response.raise_for_status()
-            audio_content = audio_response.content
 
-            # Return the audio content as a response
-            return Response(
-                content=audio_content,
+            # Relay the audio chunk by chunk instead of buffering the whole file
+            headers = {
+                "Content-Disposition": f"attachment; filename=advice_{request.user_uuid}.mp3"
+            }
+            content_length = audio_response.headers.get("Content-Length")
+            if content_length and "Content-Encoding" not in audio_response.headers:
+                headers["Content-Length"] = content_length
+            return StreamingResponse(
+                _iter_audio(audio_response),
                 media_type="audio/mpeg",
-                headers={
-                    "Content-Disposition": f"attachment; filename=advice_{request.user_uuid}.mp3"
-                },
+                headers=headers,
             )
 
         except requests.exceptions.RequestException as e:
@@ -0,0 +1,169 @@
+import asyncio
+import time
+import uuid
+from collections import defaultdict
+from typing import Any
+
+from fastapi import HTTPException, status
+
+from app.config import settings
+
+
+class Admission:
+    """A request's place in the queue and, once `wait` returns, its slot;
+    release it exactly once when the work is done or abandoned (releasing
+    again is a no-op)."""
+
+    def __init__(self, controller: "AdmissionController", user_id: uuid.UUID):
+        self._controller = controller
+        self._user_id = user_id
+        self._admitted = False
+        self._released = False
+
+    async def wait(self) -> "Admission":
+        """Wait for a slot, or raise HTTPException 503 after the queue timeout."""
+        return await self._controller._wait(self)
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._controller._release(self._user_id, self._admitted)
+
+    async def __aenter__(self) -> "Admission":
+        return self
+
+    async def __aexit__(self, *exc_info: Any):
+        self.release()
+
+
+class AdmissionController:
+    """
+    Concurrency limit for slow endpoints, with a bounded wait queue.
+
+    At most `max_concurrent` requests run at once and at most `max_queued` more
+    wait for a slot, each for up to `queue_timeout` seconds. A user may have
+    `max_per_user` requests running or waiting. Anything beyond that is turned
+    away at once, with 429 for the per-user limit and 503 otherwise, both with
+    a Retry-After header, instead of piling up and holding connections the
+    rest of the API needs. Limits apply per worker.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrent: int,
+        max_queued: int,
+        queue_timeout: float,
+        max_per_user: int,
+        retry_after: int,
+    ):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.max_per_user = max_per_user
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self.queued = 0
+        self.peak_queued = 0
+        self.admitted = 0
+        self.rejected_per_user = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self._wait_seconds_total = 0.0
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._per_user: defaultdict[uuid.UUID, int] = defaultdict(int)
+
+    def _reject(self, status_code: int, detail: str) -> HTTPException:
+        return HTTPException(
+            status_code=status_code,
+            detail=detail,
+            headers={"Retry-After": str(self.retry_after)},
+        )
+
+    async def acquire(self, user_id: uuid.UUID) -> Admission:
+        """Wait for a slot, or raise HTTPException 429/503 right away."""
+        return await self.enqueue(user_id).wait()
+
+    def enqueue(self, user_id: uuid.UUID) -> Admission:
+        """Join the queue without waiting, or raise HTTPException 429/503 right
+        away; then wait for the slot with Admission.wait."""
+        if self._per_user[user_id] >= self.max_per_user:
+            self.rejected_per_user += 1
+            raise self._reject(
+                status.HTTP_429_TOO_MANY_REQUESTS,
+                f"Too many {self.name} requests in progress for this user",
+            )
+        if self._slots.locked() and self.queued >= self.max_queued:
+            self.rejected_queue_full += 1
+            raise self._reject(
+                status.HTTP_503_SERVICE_UNAVAILABLE, f"The {self.name} queue is full"
+            )
+
+        self._per_user[user_id] += 1
+        self.queued += 1
+        self.peak_queued = max(self.peak_queued, self.queued)
+        return Admission(self, user_id)
+
+    async def _wait(self, admission: Admission) -> Admission:
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            admission.release()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self.rejected_timeout += 1
+            raise self._reject(
+                status.HTTP_503_SERVICE_UNAVAILABLE,
+                f"Timed out waiting for a {self.name} slot",
+            )
+        finally:
+            self._wait_seconds_total += time.perf_counter() - started
+
+        admission._admitted = True
+        self.queued -= 1
+        self.in_flight += 1
+        self.admitted += 1
+        return admission
+
+    def _release(self, user_id: uuid.UUID, admitted: bool):
+        if admitted:
+            self.in_flight -= 1
+            self._slots.release()
+        else:
+            self.queued -= 1
+        self._release_user(user_id)
+
+    def _release_user(self, user_id: uuid.UUID):
+        self._per_user[user_id] -= 1
+        if self._per_user[user_id] <= 0:
+            del self._per_user[user_id]
+
+    def stats(self) -> dict[str, Any]:
+        waits = self.admitted + self.rejected_timeout
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queued": self.max_queued,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "peak_queued": self.peak_queued,
+            "admitted": self.admitted,
+            "rejected_per_user": self.rejected_per_user,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_timeout": self.rejected_timeout,
+            "avg_wait_ms": (
+                round(self._wait_seconds_total / waits * 1000, 2) if waits else 0.0
+            ),
+        }
+
+
+# Agent advice calls can take up to AGENT_ADVICE_TIMEOUT_SECONDS each
+advice_admission = AdmissionController(
+    "advice",
+    max_concurrent=settings.advice_max_concurrent,
+    max_queued=settings.advice_max_queued,
+    queue_timeout=settings.advice_queue_timeout_seconds,
+    max_per_user=settings.advice_max_per_user,
+    retry_after=settings.advice_retry_after_seconds,
+)
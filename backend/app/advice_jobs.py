@@ -0,0 +1,111 @@
+import asyncio
+import logging
+import uuid
+from typing import Any
+
+from fastapi import HTTPException, Request
+
+from app.admission import Admission
+from app.agent_client import AgentClient
+from app.config import settings
+from app.crud import AdviceCacheRepository, AdviceJobRepository
+from app.database import async_session
+
+
+class AdviceJobRunner:
+    """
+    Runs advice jobs as background tasks on this worker's event loop.
+
+    The agent call and storing its result happen here, after the request that
+    created the job has returned, so neither the client, the proxy nor a
+    worker's request handling waits on the agent. Each job waits here for its
+    admission slot, joined when the job was created, and holds it until it
+    finishes. Jobs still pending or running at shutdown are marked failed.
+    """
+
+    def __init__(self):
+        self.submitted = 0
+        self.succeeded = 0
+        self.failed = 0
+        self._tasks: dict[uuid.UUID, asyncio.Task] = {}
+
+    def submit(
+        self,
+        job_id: uuid.UUID,
+        agent: AgentClient,
+        admission: Admission,
+        agent_request_data: dict[str, Any],
+        cache_key: dict[str, Any],
+    ):
+        self.submitted += 1
+        task = asyncio.create_task(
+            self._run(job_id, agent, admission, agent_request_data, cache_key)
+        )
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+
+    async def _run(
+        self,
+        job_id: uuid.UUID,
+        agent: AgentClient,
+        admission: Admission,
+        agent_request_data: dict[str, Any],
+        cache_key: dict[str, Any],
+    ):
+        try:
+            await admission.wait()
+            async with admission:
+                async with async_session() as session:
+                    await AdviceJobRepository(session).start_job(job_id)
+                response = await agent.post(
+                    "/api/advice",
+                    json=agent_request_data,
+                    timeout=settings.agent_advice_timeout_seconds,
+                )
+                response.raise_for_status()
+        except asyncio.CancelledError:
+            await self._finish(job_id, error="Interrupted by a server shutdown")
+            raise
+        except HTTPException as e:  # timed out waiting for a slot
+            await self._finish(job_id, error=e.detail)
+            return
+        except Exception as e:
+            logging.warning(f"Advice job {job_id} failed: {e}")
+            await self._finish(job_id, error=f"Error fetching advice: {str(e)}")
+            return
+
+        if agent_request_data["output_format"] == "audio":
+            content = response.content
+        else:
+            content = (response.text or "No advice available").encode()
+        await self._finish(job_id, content=content)
+        if response.content and settings.advice_cache_enabled:
+            async with async_session() as session:
+                await AdviceCacheRepository(session).put(**cache_key, content=content)
+
+    async def _finish(self, job_id: uuid.UUID, **result: Any):
+        if result.get("error") is None:
+            self.succeeded += 1
+        else:
+            self.failed += 1
+        async with async_session() as session:
+            await AdviceJobRepository(session).finish_job(job_id, **result)
+
+    async def close(self):
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "running": len(self._tasks),
+            "submitted": self.submitted,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+        }
+
+
+def get_advice_job_runner(request: Request) -> AdviceJobRunner:
+    """Dependency returning the runner created in the app lifespan."""
+    return request.app.state.advice_jobs
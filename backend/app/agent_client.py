@@ -0,0 +1,144 @@
+import logging
+import time
+from typing import Any, AsyncIterator
+
+import httpx
+from fastapi import Request
+
+from app.config import settings
+
+
+class AgentClient:
+    """
+    Pooled HTTP client for the agent service, shared for the app's lifetime.
+
+    Reusing one client keeps connections to the agent alive between requests,
+    so a call only pays for the agent's own work instead of a new TCP (and
+    possibly TLS) handshake every time.
+    """
+
+    def __init__(self):
+        http2 = settings.agent_http2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logging.warning(
+                    "AGENT_HTTP2 is set but the h2 package is missing; "
+                    "install httpx[http2]. Falling back to HTTP/1.1."
+                )
+                http2 = False
+
+        self.limits = httpx.Limits(
+            max_connections=settings.agent_max_connections,
+            max_keepalive_connections=settings.agent_max_keepalive_connections,
+            keepalive_expiry=settings.agent_keepalive_expiry_seconds,
+        )
+        self.http2 = http2
+        self._transport = httpx.AsyncHTTPTransport(limits=self.limits, http2=http2)
+        self.http = httpx.AsyncClient(
+            base_url=settings.agent_base_url,
+            transport=self._transport,
+            timeout=self.timeout(settings.agent_advice_timeout_seconds),
+        )
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self._busy_seconds = 0.0
+
+    def timeout(self, seconds: float) -> httpx.Timeout:
+        """Route-specific read timeout with the shared connect/pool timeout."""
+        return httpx.Timeout(
+            seconds,
+            connect=settings.agent_connect_timeout_seconds,
+            pool=settings.agent_connect_timeout_seconds,
+        )
+
+    def _started(self) -> float:
+        self.requests += 1
+        self.in_flight += 1
+        return time.perf_counter()
+
+    def _finished(self, started: float, failed: bool):
+        self.in_flight -= 1
+        self._busy_seconds += time.perf_counter() - started
+        if failed:
+            self.errors += 1
+
+    async def post(self, path: str, *, timeout: float, **kwargs: Any) -> httpx.Response:
+        started = self._started()
+        failed = True
+        try:
+            response = await self.http.post(
+                path, timeout=self.timeout(timeout), **kwargs
+            )
+            failed = False
+            return response
+        finally:
+            self._finished(started, failed)
+
+    async def post_stream(
+        self, path: str, *, timeout: float, **kwargs: Any
+    ) -> httpx.Response:
+        """
+        POST and return as soon as the response headers arrive.
+
+        Raises for error statuses. The body is left unread; pass the response to
+        `iter_stream`, which relays it and releases the connection.
+        """
+        started = self._started()
+        request = self.http.build_request(
+            "POST", path, timeout=self.timeout(timeout), **kwargs
+        )
+        try:
+            response = await self.http.send(request, stream=True)
+        except Exception:
+            self._finished(started, failed=True)
+            raise
+        response.extensions["agent_started"] = started
+        if response.is_error:
+            await response.aread()
+            await response.aclose()
+            self._finished(started, failed=True)
+            response.raise_for_status()
+        return response
+
+    async def iter_stream(self, response: httpx.Response) -> AsyncIterator[bytes]:
+        failed = True
+        try:
+            async for chunk in response.aiter_bytes():
+                yield chunk
+            failed = False
+        finally:
+            await response.aclose()
+            self._finished(response.extensions["agent_started"], failed)
+
+    async def aclose(self):
+        await self.http.aclose()
+
+    def stats(self) -> dict[str, Any]:
+        # httpx has no public pool API; the transport's httpcore pool does
+        pool = getattr(self._transport, "_pool", None)
+        connections = list(pool.connections) if pool is not None else []
+        idle = sum(1 for connection in connections if connection.is_idle())
+        return {
+            "http2": self.http2,
+            "max_connections": self.limits.max_connections,
+            "max_keepalive_connections": self.limits.max_keepalive_connections,
+            "connections": len(connections),
+            "idle_connections": idle,
+            "active_connections": len(connections) - idle,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "errors": self.errors,
+            "avg_latency_ms": (
+                round(self._busy_seconds / self.requests * 1000, 2)
+                if self.requests
+                else 0.0
+            ),
+        }
+
+
+def get_agent_client(request: Request) -> AgentClient:
+    """Dependency returning the client created in the app lifespan."""
+    return request.app.state.agent_client
@@ -1,4 +1,5 @@
 from pathlib import Path
+from typing import Literal, Optional
 
 from pydantic_settings import BaseSettings
 
@@ -6,19 +7,100 @@ from pydantic_settings import BaseSettings
 class Settings(BaseSettings):
     # Database settings
     database_url: str = "sqlite+aiosqlite:///./test.db"
+    # Connection pool per worker; workers x (size + overflow) must stay below
+    # the server's max_connections
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout_seconds: float = 30.0
+    db_pool_recycle_seconds: int = -1  # -1 never recycles
+    db_pool_pre_ping: bool = False
+    db_statement_cache_size: int = 100  # asyncpg prepared statements
+    # Group commit for POST /api/transactions/, see write_queue.py
+    transaction_group_commit: bool = False
+    transaction_group_commit_max_batch: int = 100
+    transaction_group_commit_window_ms: float = 5.0
+    # Apply pending migrations on startup; turn off when a deploy step runs
+    # `alembic upgrade head` so workers only check the schema version
+    db_auto_migrate: bool = True
+    # Optional read replica for read-only endpoints
+    database_replica_url: Optional[str] = None
+    # Users who wrote through this worker skip the replica for this long
+    db_replica_read_your_writes_seconds: float = 5.0
+    db_replica_tracked_writers: int = 10000
+    db_replica_check_interval_seconds: float = 10.0
 
     # Application settings
     app_name: str = "CloudMosa Accounting API"
     debug: bool = False
     agent_base_url: str = "http://agent:8000"
 
+    # Server launched by main.py. "development" is a single auto-reloading
+    # process; "production" runs `server_workers` processes (default: one per
+    # CPU core, at most 4), each with its own DB pool, caches and agent client.
+    server_mode: Literal["development", "production"] = "development"
+    server_host: str = "0.0.0.0"
+    server_port: int = 8000
+    server_workers: Optional[int] = None
+    server_loop: Literal["auto", "asyncio", "uvloop"] = "uvloop"
+    server_http: Literal["auto", "h11", "httptools"] = "httptools"
+    # Time in-flight requests get to finish on shutdown before being cut off
+    server_graceful_shutdown_seconds: int = 30
+    # Longer than Caddy's 2 minute idle timeout for upstream connections, so
+    # the proxy closes idle keep-alive connections first and never reuses one
+    # the backend is closing
+    server_keep_alive_seconds: int = 130
+    server_access_log: bool = True
+
+    # Shared HTTP client to the agent service
+    agent_max_connections: int = 100
+    agent_max_keepalive_connections: int = 20
+    agent_keepalive_expiry_seconds: float = 30.0
+    agent_connect_timeout_seconds: float = 5.0
+    agent_tip_timeout_seconds: float = 30.0
+    agent_advice_timeout_seconds: float = 120.0
+    agent_http2: bool = False  # needs httpx[http2]
+
+    # Most recent transactions sent to the agent for advice
+    advice_transaction_limit: int = 50
+
+    # Advice cache, invalidated whenever the user's transactions change
+    advice_cache_enabled: bool = True
+    advice_cache_ttl_seconds: int = 86400
+    advice_cache_max_bytes: int = 5 * 1024 * 1024
+    # Admission control for agent advice calls, per worker, see admission.py
+    advice_max_concurrent: int = 8
+    advice_max_queued: int = 16
+    advice_queue_timeout_seconds: float = 10.0
+    advice_max_per_user: int = 2
+    advice_retry_after_seconds: int = 5
+    # Finished advice jobs (and their audio) are kept this long
+    advice_job_retention_seconds: int = 86400
+
     # JWT settings
     secret_key: str = "super-secret-key"
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
 
+    # Users resolved from access tokens, cached per worker
+    user_cache_size: int = 1024
+    user_cache_ttl_seconds: float = 60.0
+    # Listing totals per user and filter, see crud.count_cache
+    transaction_count_cache_size: int = 1024
+    transaction_count_cache_ttl_seconds: float = 60.0
+    # Postgres only: partition transactions by month of `time`
+    transaction_partitioning: bool = False
+    transaction_partition_months_ahead: int = 3
+    transaction_partition_check_interval_seconds: float = 3600.0
+    # Detach month partitions older than this (None keeps everything); drop
+    # them too when transaction_retention_drop is on
+    transaction_retention_months: Optional[int] = None
+    transaction_retention_drop: bool = False
+
     # Password hashing salt
     salt: str = "default-salt-change-in-env"
+    # bcrypt cost factor (log2 rounds) for new hashes and concurrent hash limit
+    bcrypt_rounds: int = 12
+    password_hash_workers: int = 2
 
     model_config = {"extra": "ignore"}
 
@@ -1,14 +1,107 @@
+import re
 import uuid
-from datetime import datetime, timedelta
-from typing import Optional
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import AsyncIterator, Optional, Sequence
 
-from sqlalchemy import func
+from sqlalchemy import (
+    Date,
+    Row,
+    Select,
+    case,
+    cast,
+    delete,
+    func,
+    insert,
+    literal_column,
+    tuple_,
+    update,
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.sql import ColumnElement, column, table
 
-from app.models import Transaction, User
-from app.schemas import TransactionCreate, TransactionUpdate, UserCreate
-from app.security import get_password_hash
+from app.cache import TTLCache
+from app.config import settings
+from app.database import replica_router
+from app.models import (
+    SEARCH_CONFIG,
+    AdviceCacheEntry,
+    AdviceJob,
+    Transaction,
+    TransactionDailyRollup,
+    User,
+)
+from app.pagination import Cursor
+from app.schemas import (
+    AnalyticsBucket,
+    TransactionCreate,
+    TransactionImport,
+    TransactionUpdate,
+    UserCreate,
+)
+from app.security import get_password_hash_async
+
+# Plain-column select of a transaction, for read paths that skip the ORM
+# (listings and exports); the fields of the Transaction response schema
+TRANSACTION_COLUMNS = (
+    Transaction.id,
+    Transaction.user_id,
+    Transaction.income,
+    Transaction.time,
+    Transaction.description,
+    Transaction.amount,
+    Transaction.type,
+)
+
+
+# Users resolved from access tokens, see UserRepository.get_cached_user_by_id
+user_cache: TTLCache[uuid.UUID, User] = TTLCache(
+    maxsize=settings.user_cache_size, ttl=settings.user_cache_ttl_seconds
+)
+
+
+def invalidate_cached_user(user_id: uuid.UUID):
+    """Drop a cached user; call after changing or deleting that user."""
+    user_cache.invalidate(user_id)
+
+
+# Listing totals per user and (income, type, days) filter
+CountFilter = tuple[Optional[bool], Optional[str], Optional[int]]
+
+
+@dataclass
+class CachedCounts:
+    """A user's listing totals as of `version`, the user's data version."""
+
+    version: int
+    counts: dict[CountFilter, int] = field(default_factory=dict)
+
+
+# Kept up to date by the writes of this worker and checked against the user's
+# data version before use; see get_transactions_count_by_user
+count_cache: TTLCache[uuid.UUID, CachedCounts] = TTLCache(
+    maxsize=settings.transaction_count_cache_size,
+    ttl=settings.transaction_count_cache_ttl_seconds,
+)
+
+# SQLite full-text index over transactions.description and the transaction
+# ids of its rowids (migration 0003)
+TRANSACTIONS_FTS = table("transactions_fts", column("rowid"))
+TRANSACTIONS_FTS_IDS = table(
+    "transactions_fts_ids", column("rowid"), column("transaction_id")
+)
+# Words of a search query beyond this are ignored
+SEARCH_MAX_TERMS = 10
+
+# (day, type, income) -> (count delta, amount delta)
+RollupDeltas = dict[tuple[date, str, bool], tuple[int, Decimal]]
 
 
 class UserRepository:
@@ -27,15 +120,39 @@ class UserRepository:
         result = await self.db.execute(select(User).filter(User.id == user_id))
         return result.scalars().first()
 
+    async def get_data_version(self, user_id: uuid.UUID) -> int | None:
+        """The user's data version, bumped by every transaction write."""
+        result = await self.db.execute(
+            select(User.data_version).filter(User.id == user_id)
+        )
+        return result.scalar()
+
+    async def get_cached_user_by_id(self, user_id: uuid.UUID) -> User | None:
+        """Like get_user_by_id, but served from `user_cache` when possible.
+
+        The returned user is a detached copy of the row, not tied to this or
+        any other session, so a later rollback cannot expire it; only read its
+        columns.
+        """
+        user = user_cache.get(user_id)
+        if user is None:
+            db_user = await self.get_user_by_id(user_id)
+            if db_user is None:
+                return None
+            user = _detached_copy(db_user)
+            user_cache.set(user_id, user)
+        return user
+
     async def create_user(self, user: UserCreate):
         db_user = User(
             username=user.username,
             email=user.email,
-            hashed_password=get_password_hash(user.password),
+            hashed_password=await get_password_hash_async(user.password),
         )
         self.db.add(db_user)
         await self.db.commit()
         await self.db.refresh(db_user)
+        replica_router.mark_write(db_user.id)
         return db_user
 
 
@@ -48,10 +165,100 @@ class TransactionRepository:
     ) -> Transaction:
         db_transaction = Transaction(**transaction.model_dump(), user_id=user_id)
         self.db.add(db_transaction)
+        await self.db.flush()  # assigns the default time the rollup is keyed on
+        deltas = _rollup_delta(db_transaction, sign=1)
+        version = await self._record_write(user_id, deltas)
         await self.db.commit()
+        _update_cached_counts(user_id, deltas, version)
         await self.db.refresh(db_transaction)
         return db_transaction
 
+    async def create_transactions_for_users(
+        self, entries: Sequence[tuple[uuid.UUID, TransactionCreate]]
+    ) -> list[Transaction]:
+        """
+        Create transactions for any number of users in one flush and commit.
+
+        The ORM sends the rows as one batched INSERT. Used by the group-commit
+        write queue; if any row fails, nothing is stored and the caller must
+        roll back.
+        """
+        db_transactions = [
+            Transaction(**transaction.model_dump(), user_id=user_id)
+            for user_id, transaction in entries
+        ]
+        self.db.add_all(db_transactions)
+        await self.db.flush()
+
+        deltas_by_user: dict[uuid.UUID, RollupDeltas] = defaultdict(
+            lambda: defaultdict(lambda: (0, Decimal(0)))
+        )
+        for db_transaction in db_transactions:
+            deltas = deltas_by_user[db_transaction.user_id]
+            for key, (count, total) in _rollup_delta(db_transaction, sign=1).items():
+                old_count, old_total = deltas[key]
+                deltas[key] = (old_count + count, old_total + total)
+        # Lock the users' rows in one order, so concurrent batches that share
+        # users cannot deadlock
+        versions = {
+            user_id: await self._record_write(user_id, deltas_by_user[user_id])
+            for user_id in sorted(deltas_by_user)
+        }
+        await self.db.commit()
+        for user_id, deltas in deltas_by_user.items():
+            _update_cached_counts(user_id, deltas, versions[user_id])
+        return db_transactions
+
+    async def bulk_create_transactions(
+        self, user_id: uuid.UUID, transactions: list[TransactionImport]
+    ) -> int:
+        """
+        Insert many transactions in one round trip and commit them together.
+
+        Uses COPY on Postgres and a multi-row executemany INSERT elsewhere. The
+        bookkeeping UPDATE runs first so the session's transaction has begun
+        before the COPY, which asyncpg would otherwise run in autocommit mode.
+        Either all rows are stored or, on error, none are and the caller must
+        roll back.
+        """
+        now = datetime.utcnow()
+        rows = [
+            {
+                "id": uuid.uuid4(),
+                "user_id": user_id,
+                "income": transaction.income,
+                "time": transaction.time or now,
+                "description": transaction.description,
+                "amount": Decimal(str(transaction.amount)),
+                "type": transaction.type,
+            }
+            for transaction in transactions
+        ]
+        if not rows:
+            return 0
+
+        deltas: RollupDeltas = defaultdict(lambda: (0, Decimal(0)))
+        for row in rows:
+            key = (row["time"].date(), row["type"], row["income"])
+            count, total = deltas[key]
+            deltas[key] = (count + 1, total + row["amount"])
+        version = await self._record_write(user_id, deltas)
+
+        conn = await self.db.connection()
+        if conn.dialect.name == "postgresql":
+            raw = await conn.get_raw_connection()
+            columns = list(rows[0])
+            await raw.driver_connection.copy_records_to_table(
+                Transaction.__tablename__,
+                records=[tuple(row[c] for c in columns) for row in rows],
+                columns=columns,
+            )
+        else:
+            await self.db.execute(insert(Transaction), rows)
+        await self.db.commit()
+        _update_cached_counts(user_id, deltas, version)
+        return len(rows)
+
     async def get_transaction_by_id(
         self, transaction_id: uuid.UUID, user_id: uuid.UUID
     ) -> Transaction | None:
@@ -62,16 +269,15 @@ class TransactionRepository:
         )
         return result.scalars().first()
 
-    async def get_transactions_by_user(
+    def _filter_transactions(
         self,
+        query: Select,
         user_id: uuid.UUID,
-        skip: int = 0,
-        limit: int = 100,
         income: Optional[bool] = None,
         type: Optional[str] = None,
         days: Optional[int] = None,
-    ) -> list[Transaction]:
-        query = select(Transaction).filter(Transaction.user_id == user_id)
+    ) -> Select:
+        query = query.filter(Transaction.user_id == user_id)
         if income is not None:
             query = query.filter(Transaction.income == income)
         if type is not None:
@@ -79,12 +285,170 @@ class TransactionRepository:
         if days is not None:
             cutoff_date = datetime.utcnow() - timedelta(days=days)
             query = query.filter(Transaction.time >= cutoff_date)
+        return query
+
+    async def get_transactions_by_user(
+        self,
+        user_id: uuid.UUID,
+        skip: int = 0,
+        limit: int = 100,
+        income: Optional[bool] = None,
+        type: Optional[str] = None,
+        days: Optional[int] = None,
+    ) -> list[Row]:
+        """Get a page of transactions as TRANSACTION_COLUMNS rows."""
+        query = self._filter_transactions(
+            select(*TRANSACTION_COLUMNS), user_id, income=income, type=type, days=days
+        )
         result = await self.db.execute(
-            query.offset(skip)
-            .limit(limit)
-            .order_by(Transaction.time.desc())  # Order by most recent first
+            query.offset(skip).limit(limit)
+            # Order by most recent first, id breaks ties so cursors stay stable
+            .order_by(Transaction.time.desc(), Transaction.id.desc())
         )
-        return list(result.scalars().all())
+        return list(result.all())
+
+    async def get_transactions_by_user_keyset(
+        self,
+        user_id: uuid.UUID,
+        cursor: Optional[Cursor] = None,
+        limit: int = 100,
+        income: Optional[bool] = None,
+        type: Optional[str] = None,
+        days: Optional[int] = None,
+    ) -> tuple[list[Row], bool]:
+        """
+        Get a page of TRANSACTION_COLUMNS rows positioned by a (time, id) cursor.
+
+        Seeks directly to the cursor instead of skipping rows, so the cost of a
+        page does not depend on how deep it is. One extra row is fetched to tell
+        whether more rows exist past the page in the cursor's direction.
+
+        Returns the page in (time DESC, id DESC) order and that flag.
+        """
+        query = self._filter_transactions(
+            select(*TRANSACTION_COLUMNS), user_id, income=income, type=type, days=days
+        )
+        # The plain time bounds are implied by the row comparisons but, unlike
+        # them, let Postgres skip partitions outside the page's direction
+        position = tuple_(Transaction.time, Transaction.id)
+        if cursor is not None and cursor.direction == "prev":
+            query = query.filter(
+                Transaction.time >= cursor.time, position > (cursor.time, cursor.id)
+            ).order_by(Transaction.time.asc(), Transaction.id.asc())
+        else:
+            if cursor is not None:
+                query = query.filter(
+                    Transaction.time <= cursor.time,
+                    position < (cursor.time, cursor.id),
+                )
+            query = query.order_by(Transaction.time.desc(), Transaction.id.desc())
+
+        result = await self.db.execute(query.limit(limit + 1))
+        transactions = list(result.all())
+        has_more = len(transactions) > limit
+        transactions = transactions[:limit]
+        if cursor is not None and cursor.direction == "prev":
+            transactions.reverse()
+        return transactions, has_more
+
+    async def search_transactions_by_user(
+        self,
+        user_id: uuid.UUID,
+        q: str,
+        cursor: Optional[Cursor] = None,
+        limit: int = 20,
+        income: Optional[bool] = None,
+        type: Optional[str] = None,
+        days: Optional[int] = None,
+    ) -> tuple[list[Row], bool]:
+        """
+        Get a page of transactions whose description has every word of `q` as
+        a word or word prefix, best match first.
+
+        Rows are TRANSACTION_COLUMNS plus a trailing `rank` (higher is better),
+        in (rank DESC, time DESC, id DESC) order and positioned by a cursor
+        with that rank, like get_transactions_by_user_keyset. Matching uses
+        the full-text index: a GIN index on (user_id, to_tsvector) on
+        Postgres, so only this user's matches are read. SQLite's FTS5 table
+        covers every user's descriptions, so there a common term is matched
+        and ranked across all users before the user_id filter applies.
+        """
+        terms = re.findall(r"\w+", q)[:SEARCH_MAX_TERMS]
+        if not terms:
+            return [], False
+
+        conn = await self.db.connection()
+        if conn.dialect.name == "postgresql":
+            # The literal config keeps the expression identical to the index's
+            config = literal_column(f"'{SEARCH_CONFIG}'")
+            vector = func.to_tsvector(config, Transaction.description)
+            tsquery = func.to_tsquery(config, " & ".join(f"{t}:*" for t in terms))
+            query = select(
+                *TRANSACTION_COLUMNS, func.ts_rank(vector, tsquery).label("rank")
+            ).filter(vector.op("@@")(tsquery))
+        else:
+            # bm25() is lower for better matches
+            fts = literal_column(TRANSACTIONS_FTS.name)
+            query = (
+                select(*TRANSACTION_COLUMNS, (-func.bm25(fts)).label("rank"))
+                .join(
+                    TRANSACTIONS_FTS_IDS,
+                    TRANSACTIONS_FTS_IDS.c.transaction_id == Transaction.id,
+                )
+                .join(
+                    TRANSACTIONS_FTS,
+                    TRANSACTIONS_FTS.c.rowid == TRANSACTIONS_FTS_IDS.c.rowid,
+                )
+                .filter(fts.op("MATCH")(" ".join(f'"{t}"*' for t in terms)))
+            )
+        matches = self._filter_transactions(
+            query, user_id, income=income, type=type, days=days
+        ).subquery()
+
+        query = select(matches)
+        position = tuple_(matches.c.rank, matches.c.time, matches.c.id)
+        order = (matches.c.rank, matches.c.time, matches.c.id)
+        if cursor is not None and cursor.direction == "prev":
+            query = query.filter(
+                position > (cursor.rank, cursor.time, cursor.id)
+            ).order_by(*(c.asc() for c in order))
+        else:
+            if cursor is not None:
+                query = query.filter(position < (cursor.rank, cursor.time, cursor.id))
+            query = query.order_by(*(c.desc() for c in order))
+
+        result = await self.db.execute(query.limit(limit + 1))
+        transactions = list(result.all())
+        has_more = len(transactions) > limit
+        transactions = transactions[:limit]
+        if cursor is not None and cursor.direction == "prev":
+            transactions.reverse()
+        return transactions, has_more
+
+    async def stream_transactions_by_user(
+        self,
+        user_id: uuid.UUID,
+        income: Optional[bool] = None,
+        type: Optional[str] = None,
+        days: Optional[int] = None,
+        batch_size: int = 1000,
+    ) -> AsyncIterator[Sequence[Row]]:
+        """
+        Yield all of a user's transactions, most recent first, in batches.
+
+        Rows come from a server-side cursor as plain column tuples, so at most
+        one batch is held in memory no matter how long the history is.
+        """
+        query = self._filter_transactions(
+            select(*TRANSACTION_COLUMNS), user_id, income=income, type=type, days=days
+        )
+        result = await self.db.stream(
+            query.order_by(
+                Transaction.time.desc(), Transaction.id.desc()
+            ).execution_options(yield_per=batch_size)
+        )
+        async for partition in result.partitions():
+            yield partition
 
     async def get_transactions_count_by_user(
         self,
@@ -92,19 +456,70 @@ class TransactionRepository:
         income: Optional[bool] = None,
         type: Optional[str] = None,
         days: Optional[int] = None,
+        version: Optional[int] = None,
     ) -> int:
-        query = select(func.count(Transaction.id)).filter(
-            Transaction.user_id == user_id
+        """
+        Count a user's transactions matching the listing filters.
+
+        Without a `days` window the count comes from count_cache if it was
+        taken at the user's current data version, which costs one lookup of
+        the users row (none if the caller passes the `version` it just read),
+        so it includes every committed write, whichever worker made it.
+        Otherwise it is summed from the daily rollups, which hold one row per
+        day and category rather than one per transaction. Counts over a `days`
+        window are always a COUNT over the composite index, as rows leave the
+        window without any write.
+        """
+        key = (income, type, days)
+        cached = count_cache.get(user_id)
+        if cached is not None and days is None and key in cached.counts:
+            if version is None:
+                version = await UserRepository(self.db).get_data_version(user_id)
+            if cached.version == version:
+                return cached.counts[key]
+
+        if days is None:
+            query = select(func.sum(TransactionDailyRollup.count)).filter(
+                TransactionDailyRollup.user_id == user_id
+            )
+            if income is not None:
+                query = query.filter(TransactionDailyRollup.income == income)
+            if type is not None:
+                query = query.filter(TransactionDailyRollup.type == type)
+        else:
+            query = self._filter_transactions(
+                select(func.count(Transaction.id)),
+                user_id,
+                income=income,
+                type=type,
+                days=days,
+            )
+        # Read the version in the same statement, so the count is stored
+        # under the version it was taken at even if a write commits meanwhile
+        version_query = (
+            select(User.data_version).filter(User.id == user_id).scalar_subquery()
         )
-        if income is not None:
-            query = query.filter(Transaction.income == income)
-        if type is not None:
-            query = query.filter(Transaction.type == type)
-        if days is not None:
-            cutoff_date = datetime.utcnow() - timedelta(days=days)
-            query = query.filter(Transaction.time >= cutoff_date)
-        result = await self.db.execute(query)
-        return result.scalar() or 0
+        total, version = (await self.db.execute(query.add_columns(version_query))).one()
+        total = total or 0
+
+        if version is not None:
+            if cached is None or cached.version != version:
+                cached = CachedCounts(version)
+                count_cache.set(user_id, cached)
+            cached.counts[key] = total
+        return total
+
+    def get_cached_transactions_count_by_user(
+        self,
+        user_id: uuid.UUID,
+        income: Optional[bool] = None,
+        type: Optional[str] = None,
+        days: Optional[int] = None,
+    ) -> Optional[int]:
+        """The cached count for these filters, if any, without querying. It can
+        miss other workers' writes made since it was counted."""
+        cached = count_cache.get(user_id)
+        return cached.counts.get((income, type, days)) if cached is not None else None
 
     async def update_transaction(
         self,
@@ -114,10 +529,16 @@ class TransactionRepository:
     ) -> Transaction | None:
         db_transaction = await self.get_transaction_by_id(transaction_id, user_id)
         if db_transaction:
+            deltas = _rollup_delta(db_transaction, sign=-1)
             update_data = transaction_update.model_dump(exclude_unset=True)
             for key, value in update_data.items():
                 setattr(db_transaction, key, value)
+            for key, (count, total) in _rollup_delta(db_transaction, sign=1).items():
+                old_count, old_total = deltas.get(key, (0, Decimal(0)))
+                deltas[key] = (old_count + count, old_total + total)
+            version = await self._record_write(user_id, deltas)
             await self.db.commit()
+            _update_cached_counts(user_id, deltas, version)
             await self.db.refresh(db_transaction)
         return db_transaction
 
@@ -137,11 +558,325 @@ class TransactionRepository:
         result = await self.db.execute(query)
         return list(result.scalars().all())
 
+    async def get_advice_transactions_by_user(
+        self, user_id: uuid.UUID, days: int, limit: int
+    ) -> list[Row]:
+        """Get the `limit` most recent transactions within the last X days, with
+        only the columns the agent reads; the limit is applied in SQL."""
+        cutoff_date = datetime.utcnow() - timedelta(days=days)
+        query = (
+            select(
+                Transaction.income,
+                Transaction.description,
+                Transaction.amount,
+                Transaction.type,
+            )
+            .filter(Transaction.user_id == user_id, Transaction.time >= cutoff_date)
+            .order_by(Transaction.time.desc(), Transaction.id.desc())
+            .limit(limit)
+        )
+        result = await self.db.execute(query)
+        return list(result.all())
+
     async def delete_transaction(
         self, transaction_id: uuid.UUID, user_id: uuid.UUID
     ) -> Transaction | None:
         db_transaction = await self.get_transaction_by_id(transaction_id, user_id)
         if db_transaction:
             await self.db.delete(db_transaction)
+            deltas = _rollup_delta(db_transaction, sign=-1)
+            version = await self._record_write(user_id, deltas)
             await self.db.commit()
+            _update_cached_counts(user_id, deltas, version)
         return db_transaction
+
+    async def _record_write(self, user_id: uuid.UUID, deltas: RollupDeltas) -> int:
+        """Bookkeeping shared by every transaction write, run before its commit:
+        bump the user's data version (see app.etags), update the daily
+        rollups, drop the user's cached advice and keep the user's reads on
+        the primary until the replica has caught up. Returns the new version,
+        which the write's row lock on the user makes exact."""
+        version = await self.db.scalar(
+            update(User)
+            .filter(User.id == user_id)
+            .values(data_version=User.data_version + 1)
+            .returning(User.data_version)
+        )
+        await self._apply_rollup_deltas(user_id, deltas)
+        await AdviceCacheRepository(self.db).invalidate_user(user_id)
+        replica_router.mark_write(user_id)
+        return version
+
+    async def _apply_rollup_deltas(self, user_id: uuid.UUID, deltas: RollupDeltas):
+        """Add count/total deltas to the user's daily rollups, inside the caller's
+        transaction so rollups commit (or roll back) together with the rows."""
+        rows = [
+            {
+                "user_id": user_id,
+                "day": day,
+                "type": type,
+                "income": income,
+                "count": count,
+                "total": total,
+            }
+            for (day, type, income), (count, total) in deltas.items()
+            if count or total
+        ]
+        if not rows:
+            return
+
+        conn = await self.db.connection()
+        upsert = (pg_insert if conn.dialect.name == "postgresql" else sqlite_insert)(
+            TransactionDailyRollup
+        )
+        upsert = upsert.on_conflict_do_update(
+            index_elements=["user_id", "day", "type", "income"],
+            set_={
+                "count": TransactionDailyRollup.count + upsert.excluded.count,
+                "total": TransactionDailyRollup.total + upsert.excluded.total,
+            },
+        )
+        await self.db.execute(upsert, rows)
+        if any(row["count"] < 0 for row in rows):
+            await self.db.execute(
+                delete(TransactionDailyRollup).filter(
+                    TransactionDailyRollup.user_id == user_id,
+                    TransactionDailyRollup.count <= 0,
+                )
+            )
+
+    async def get_rollup_totals_by_user(
+        self,
+        user_id: uuid.UUID,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+    ) -> list[Row]:
+        """Sum the daily rollups per (type, income) over an inclusive day range.
+
+        Reads at most one row per day and category, never the transactions.
+        """
+        query = select(
+            TransactionDailyRollup.type,
+            TransactionDailyRollup.income,
+            func.sum(TransactionDailyRollup.count).label("count"),
+            func.sum(TransactionDailyRollup.total).label("total"),
+        ).filter(TransactionDailyRollup.user_id == user_id)
+        if start is not None:
+            query = query.filter(TransactionDailyRollup.day >= start)
+        if end is not None:
+            query = query.filter(TransactionDailyRollup.day <= end)
+        query = query.group_by(
+            TransactionDailyRollup.type, TransactionDailyRollup.income
+        ).order_by(func.sum(TransactionDailyRollup.total).desc())
+        result = await self.db.execute(query)
+        return list(result.all())
+
+    async def get_rollup_series_by_user(
+        self,
+        user_id: uuid.UUID,
+        bucket: AnalyticsBucket,
+        by_type: bool = False,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+    ) -> list[Row]:
+        """Income, expense and count per day, week or month (and type), oldest
+        first, summed in SQL from the daily rollups.
+        """
+        conn = await self.db.connection()
+        bucket_start = _bucket_start(
+            conn.dialect.name, bucket, TransactionDailyRollup.day
+        ).label("bucket")
+        group_by: list[ColumnElement] = [bucket_start]
+        if by_type:
+            group_by.append(TransactionDailyRollup.type)
+        query = select(
+            *group_by,
+            func.sum(
+                case((TransactionDailyRollup.income, TransactionDailyRollup.total))
+            ).label("income"),
+            func.sum(
+                case((~TransactionDailyRollup.income, TransactionDailyRollup.total))
+            ).label("expense"),
+            func.sum(TransactionDailyRollup.count).label("count"),
+        ).filter(TransactionDailyRollup.user_id == user_id)
+        if start is not None:
+            query = query.filter(TransactionDailyRollup.day >= start)
+        if end is not None:
+            query = query.filter(TransactionDailyRollup.day <= end)
+        query = query.group_by(*group_by).order_by(*group_by)
+        result = await self.db.execute(query)
+        return list(result.all())
+
+
+class AdviceCacheRepository:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get(
+        self, user_id: uuid.UUID, days: int, output_format: str, fingerprint: str
+    ) -> bytes | None:
+        cutoff = datetime.utcnow() - timedelta(
+            seconds=settings.advice_cache_ttl_seconds
+        )
+        result = await self.db.execute(
+            select(AdviceCacheEntry.content).filter(
+                AdviceCacheEntry.user_id == user_id,
+                AdviceCacheEntry.days == days,
+                AdviceCacheEntry.output_format == output_format,
+                AdviceCacheEntry.fingerprint == fingerprint,
+                AdviceCacheEntry.created_at >= cutoff,
+            )
+        )
+        return result.scalar()
+
+    async def put(
+        self,
+        user_id: uuid.UUID,
+        days: int,
+        output_format: str,
+        fingerprint: str,
+        content: bytes,
+    ):
+        """Store advice; best effort, a concurrent insert of the same key wins."""
+        await self.db.merge(
+            AdviceCacheEntry(
+                user_id=user_id,
+                days=days,
+                output_format=output_format,
+                fingerprint=fingerprint,
+                content=content,
+                created_at=datetime.utcnow(),
+            )
+        )
+        try:
+            await self.db.commit()
+        except IntegrityError:
+            await self.db.rollback()
+
+    async def invalidate_user(self, user_id: uuid.UUID):
+        """Drop the user's cached advice; runs in the caller's transaction."""
+        await self.db.execute(
+            delete(AdviceCacheEntry).filter(AdviceCacheEntry.user_id == user_id)
+        )
+
+
+class AdviceJobRepository:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def create_job(
+        self,
+        user_id: uuid.UUID,
+        output_format: str,
+        content: Optional[bytes] = None,
+    ) -> AdviceJob:
+        """Create a pending job, or a finished one when `content` is already
+        known. Also drops the user's jobs past the retention period."""
+        now = datetime.utcnow()
+        cutoff = now - timedelta(seconds=settings.advice_job_retention_seconds)
+        await self.db.execute(
+            delete(AdviceJob).filter(
+                AdviceJob.user_id == user_id, AdviceJob.created_at < cutoff
+            )
+        )
+        job = AdviceJob(
+            user_id=user_id,
+            output_format=output_format,
+            status="pending",
+            created_at=now,
+        )
+        if content is not None:
+            job.status = "succeeded"
+            job.content = content
+            job.finished_at = now
+        self.db.add(job)
+        await self.db.commit()
+        return job
+
+    async def get_job(self, job_id: uuid.UUID, user_id: uuid.UUID) -> AdviceJob | None:
+        result = await self.db.execute(
+            select(AdviceJob).filter(
+                AdviceJob.id == job_id, AdviceJob.user_id == user_id
+            )
+        )
+        return result.scalars().first()
+
+    async def start_job(self, job_id: uuid.UUID):
+        await self.db.execute(
+            update(AdviceJob)
+            .filter(AdviceJob.id == job_id, AdviceJob.status == "pending")
+            .values(status="running")
+        )
+        await self.db.commit()
+
+    async def finish_job(
+        self,
+        job_id: uuid.UUID,
+        content: Optional[bytes] = None,
+        error: Optional[str] = None,
+    ):
+        await self.db.execute(
+            update(AdviceJob)
+            .filter(AdviceJob.id == job_id)
+            .values(
+                status="failed" if error is not None else "succeeded",
+                content=content,
+                error=error,
+                finished_at=datetime.utcnow(),
+            )
+        )
+        await self.db.commit()
+
+
+def _detached_copy(user: User) -> User:
+    copy = User(**{c.key: getattr(user, c.key) for c in User.__table__.columns})
+    make_transient_to_detached(copy)
+    return copy
+
+
+def _bucket_start(
+    dialect_name: str, bucket: AnalyticsBucket, day: ColumnElement
+) -> ColumnElement:
+    # SQLite keeps dates as YYYY-MM-DD text and date() returns the same form
+    if dialect_name == "sqlite":
+        modifiers = {
+            "day": (),
+            "week": ("weekday 0", "-6 days"),
+            "month": ("start of month",),
+        }
+        return func.date(day, *modifiers[bucket], type_=Date)
+    # date_trunc('week') starts weeks on Monday, like the SQLite form
+    return cast(func.date_trunc(bucket, day), Date)
+
+
+def _rollup_delta(transaction: Transaction, sign: int) -> RollupDeltas:
+    key = (transaction.time.date(), transaction.type, transaction.income)
+    return {key: (sign, sign * Decimal(str(transaction.amount)))}
+
+
+def _update_cached_counts(user_id: uuid.UUID, deltas: RollupDeltas, version: int):
+    """
+    Apply a committed write's deltas to the user's cached counts and move them
+    to the write's data version. Only done if they were taken just before the
+    write; otherwise another write came between and they are dropped. Counts
+    over a `days` window are dropped too, as the window's start moves.
+    """
+    cached = count_cache.peek(user_id)
+    if cached is None:
+        return
+    if cached.version != version - 1:
+        count_cache.invalidate(user_id)
+        return
+    cached.version = version
+    counts = cached.counts
+    for key in list(counts):
+        income, type, days = key
+        if days is not None:
+            del counts[key]
+            continue
+        counts[key] += sum(
+            count
+            for (_, delta_type, delta_income), (count, _) in deltas.items()
+            if (income is None or delta_income == income)
+            and (type is None or delta_type == type)
+        )
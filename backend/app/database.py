@@ -1,20 +1,107 @@
-from typing import AsyncGenerator
+import asyncio
+import functools
+import logging
+import time
+import uuid
+from pathlib import Path
+from typing import Any, AsyncGenerator, Optional
 
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from alembic import command
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from fastapi import Depends
+from sqlalchemy import UUID, event, exc, select, text
+from sqlalchemy.engine import Connection, make_url
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, Pool
+from sqlalchemy.sql import column, table
 
+from app.cache import TTLCache
 from app.config import settings
+from app.security import get_current_user_id
+
+ALEMBIC_CONFIG = str(Path(__file__).resolve().parent.parent / "alembic.ini")
+# Arbitrary key for the Postgres advisory lock held while migrating
+MIGRATION_LOCK_ID = 7_316_540
+_migration_lock = asyncio.Lock()
 
 
 class Base(DeclarativeBase):
     pass
 
 
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """The default async pool, plus counters for the time each checkout took,
+    queueing for a free connection or opening a new one."""
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "size": self.size(),
+            "checked_out": self.checkedout(),
+            "idle": self.checkedin(),
+            "overflow": max(self.overflow(), 0),
+            "max_overflow": self._max_overflow,
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "avg_wait_ms": (
+                round(self.wait_seconds_total / self.checkouts * 1000, 3)
+                if self.checkouts
+                else 0.0
+            ),
+            "max_wait_ms": round(self.wait_seconds_max * 1000, 3),
+        }
+
+
+def _engine_options(database_url: str) -> dict[str, Any]:
+    options: dict[str, Any] = {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout_seconds,
+        "pool_recycle": settings.db_pool_recycle_seconds,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+    if make_url(database_url).get_backend_name() == "postgresql":
+        # SQLAlchemy's per-connection cache of asyncpg prepared statements
+        options["connect_args"] = {
+            "prepared_statement_cache_size": settings.db_statement_cache_size
+        }
+    return options
+
+
 # Create async engine
 engine = create_async_engine(
     settings.database_url,
     echo=settings.debug,
     future=True,
+    **_engine_options(settings.database_url),
 )
 
 # Create async session factory
@@ -25,6 +112,110 @@ async_session = async_sessionmaker(
 )
 
 
+# Optional read replica for read-only endpoints, see get_read_db
+replica_engine = (
+    create_async_engine(
+        settings.database_replica_url,
+        echo=settings.debug,
+        future=True,
+        **_engine_options(settings.database_replica_url),
+    )
+    if settings.database_replica_url
+    else None
+)
+replica_session = (
+    async_sessionmaker(replica_engine, class_=AsyncSession, expire_on_commit=False)
+    if replica_engine is not None
+    else None
+)
+
+
+# The columns of users that ReplicaRouter.caught_up reads; app.models imports
+# this module, so it cannot use the User model
+_users = table("users", column("id", UUID(as_uuid=True)), column("data_version"))
+
+
+class ReplicaRouter:
+    """
+    Decides per request whether reads may go to the replica.
+
+    A user's reads go to the replica only once it has caught up with the
+    user's writes: the user's data version (see app.etags), bumped by every
+    transaction write, must be the same there as on the primary. That costs a
+    primary key lookup on each, and holds whichever worker made the write.
+    Users who wrote through this worker within the last
+    `db_replica_read_your_writes_seconds` go straight to the primary. The
+    replica is skipped while it is unhealthy; a failed query marks it so, and
+    `monitor` flips it back once a ping succeeds.
+    """
+
+    def __init__(self):
+        self.healthy = True
+        self.replica_reads = 0
+        self.primary_reads = 0
+        self.lagging_reads = 0
+        self._recent_writers: TTLCache[uuid.UUID, bool] = TTLCache(
+            maxsize=settings.db_replica_tracked_writers,
+            ttl=settings.db_replica_read_your_writes_seconds,
+        )
+
+    def mark_write(self, user_id: uuid.UUID):
+        if replica_session is not None:
+            self._recent_writers.set(user_id, True)
+
+    def may_use_replica(self, user_id: uuid.UUID) -> bool:
+        return (
+            replica_session is not None
+            and self.healthy
+            and self._recent_writers.get(user_id) is None
+        )
+
+    async def caught_up(
+        self, user_id: uuid.UUID, primary: AsyncSession, replica: AsyncSession
+    ) -> bool:
+        """Whether the replica has the user's latest writes. Ends the primary
+        session's transaction, so it does not hold a connection meanwhile."""
+        query = select(_users.c.data_version).filter(_users.c.id == user_id)
+        primary_version = await primary.scalar(query)
+        await primary.rollback()
+        if primary_version is None:
+            return False
+        if await replica.scalar(query) == primary_version:
+            return True
+        self.lagging_reads += 1
+        return False
+
+    async def monitor(self):
+        """Ping the replica periodically; run as a background task."""
+        if replica_engine is None:
+            return
+        while True:
+            try:
+                async with replica_engine.connect() as conn:
+                    await conn.execute(text("SELECT 1"))
+                self.healthy = True
+            except Exception as e:
+                if self.healthy:
+                    logging.warning(f"Read replica unhealthy, using primary: {e}")
+                self.healthy = False
+            await asyncio.sleep(settings.db_replica_check_interval_seconds)
+
+    def stats(self) -> dict[str, Any]:
+        stats: dict[str, Any] = {
+            "configured": replica_engine is not None,
+            "healthy": self.healthy,
+            "replica_reads": self.replica_reads,
+            "primary_reads": self.primary_reads,
+            "lagging_reads": self.lagging_reads,
+        }
+        if replica_engine is not None:
+            stats["pool"] = _pool_stats(replica_engine.pool)
+        return stats
+
+
+replica_router = ReplicaRouter()
+
+
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """Dependency to get database session"""
 
@@ -35,8 +226,108 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
             await session.close()
 
 
-async def create_tables():
-    """Create all tables"""
+async def get_read_db(
+    user_id: uuid.UUID = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db),
+) -> AsyncGenerator[AsyncSession, None]:
+    """Dependency to get a session for read-only work.
+
+    Uses the read replica when one is configured and healthy and has caught
+    up with the user's writes; otherwise shares the request's primary session.
+    """
+
+    if replica_router.may_use_replica(user_id):
+        async with replica_session() as session:
+            try:
+                if await replica_router.caught_up(user_id, db, session):
+                    replica_router.replica_reads += 1
+                    yield session
+                    return
+            except (DBAPIError, OSError) as e:
+                if not isinstance(e, DBAPIError) or e.connection_invalidated:
+                    replica_router.healthy = False
+                raise
+            finally:
+                await session.close()
+    replica_router.primary_reads += 1
+    yield db
+
+
+def _pool_stats(pool: Pool) -> dict[str, Any]:
+    if isinstance(pool, InstrumentedQueuePool):
+        return pool.stats()
+    return {"status": pool.status()}
+
+
+def pool_stats() -> dict[str, Any]:
+    """Connection pool usage of this worker's engine."""
+    return _pool_stats(engine.pool)
+
+
+def _alembic_config() -> Config:
+    return Config(ALEMBIC_CONFIG)
 
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+
+@functools.cache
+def _head_revision() -> Optional[str]:
+    return ScriptDirectory.from_config(_alembic_config()).get_current_head()
+
+
+def _upgrade(connection: Connection):
+    if connection.dialect.name == "postgresql":
+        # Workers starting together queue here (on SQLite, at BEGIN IMMEDIATE);
+        # the rest then find nothing left to do
+        connection.execute(
+            text("SELECT pg_advisory_xact_lock(:id)"), {"id": MIGRATION_LOCK_ID}
+        )
+    config = _alembic_config()
+    config.attributes["connection"] = connection
+    command.upgrade(config, "head")
+
+
+def _migration_engine() -> AsyncEngine:
+    """Short-lived engine for migrating; its transactions hold the write lock
+    on SQLite, which other worker processes then wait for."""
+    migration_engine = create_async_engine(settings.database_url, poolclass=NullPool)
+    if migration_engine.dialect.name == "sqlite":
+
+        @event.listens_for(migration_engine.sync_engine, "connect")
+        def _driver_autocommit(dbapi_connection, connection_record):
+            dbapi_connection.isolation_level = None
+
+        @event.listens_for(migration_engine.sync_engine, "begin")
+        def _begin_immediate(conn):
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+    return migration_engine
+
+
+async def ensure_schema():
+    """
+    Check that the database is at the latest migration.
+
+    On an up-to-date database this is one lookup of the alembic_version row.
+    Otherwise the migrations are applied when DB_AUTO_MIGRATE is on; with it
+    off, run `alembic upgrade head` once per deploy before starting workers.
+    """
+    head = _head_revision()
+    async with engine.connect() as conn:
+        try:
+            current = await conn.scalar(text("SELECT version_num FROM alembic_version"))
+        except DBAPIError:
+            current = None  # not migrated yet
+    if current == head:
+        return
+    if not settings.db_auto_migrate:
+        raise RuntimeError(
+            f"Database schema is at revision {current}, expected {head}; "
+            "run `alembic upgrade head`"
+        )
+    logging.info(f"Migrating database schema from {current} to {head}")
+    migration_engine = _migration_engine()
+    try:
+        # Alembic's migration context is process-global
+        async with _migration_lock, migration_engine.begin() as conn:
+            await conn.run_sync(_upgrade)
+    finally:
+        await migration_engine.dispose()
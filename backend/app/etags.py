@@ -0,0 +1,46 @@
+import hashlib
+import uuid
+from typing import Any, Optional
+
+from fastapi import Response
+
+# Clients may keep the response but must revalidate it; shared caches may not
+# store it at all
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(user_id: uuid.UUID, version: Optional[int], *parts: Any) -> str:
+    """
+    Strong ETag for a response that is fully determined by the user's data
+    version and `parts` (e.g. the query parameters).
+
+    Only use it where nothing else changes the body: a response that also
+    depends on the clock or on cache state must not get one. Read the version
+    before the data, so a write in between can only cause an extra 200.
+    """
+    digest = hashlib.sha256(repr((str(user_id), *parts)).encode()).hexdigest()
+    return f'"{version}-{digest[:16]}"'
+
+
+def content_etag(body: bytes) -> str:
+    """Strong ETag from a response body, for responses that do not follow the
+    data version."""
+    return f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Evaluate an If-None-Match header, which uses the weak comparison."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag in tags
+
+
+def etag_headers(etag: str) -> dict[str, str]:
+    return {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers=etag_headers(etag))
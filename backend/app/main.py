@@ -1,19 +1,41 @@
-from contextlib import asynccontextmanager
+import asyncio
+from contextlib import asynccontextmanager, suppress
 
 from fastapi import FastAPI
 
+from app.advice_jobs import AdviceJobRunner
+from app.agent_client import AgentClient
 from app.config import settings
-from app.database import create_tables
+from app.database import ensure_schema, replica_router
+from app.partitions import ensure_partitioning, partition_maintainer
 from app.routers import auth, finance, health, transactions, users
+from app.security import password_executor
+from app.write_queue import create_write_queue
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    await create_tables()
+    await ensure_schema()
+    await ensure_partitioning()
+    app.state.agent_client = AgentClient()
+    app.state.advice_jobs = AdviceJobRunner()
+    replica_monitor = asyncio.create_task(replica_router.monitor())
+    partition_monitor = asyncio.create_task(partition_maintainer.monitor())
+    app.state.write_queue = create_write_queue()
+    if app.state.write_queue is not None:
+        app.state.write_queue.start()
     yield
     # Shutdown
-    # Add cleanup code here if needed
+    if app.state.write_queue is not None:
+        await app.state.write_queue.close()
+    for task in (replica_monitor, partition_monitor):
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    await app.state.advice_jobs.close()
+    await app.state.agent_client.aclose()
+    password_executor.shutdown(wait=False, cancel_futures=True)
 
 
 app = FastAPI(
@@ -1,20 +1,29 @@
 import uuid
-from datetime import datetime
+from datetime import date, datetime
+from typing import Optional
 
 from sqlalchemy import (
     UUID,
     Boolean,
     CheckConstraint,
     ForeignKey,
+    Index,
+    Integer,
+    LargeBinary,
     Numeric,
     String,
     Text,
     func,
+    text,
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.database import Base
 
+# Postgres text search configuration for descriptions: no stemming or stop
+# words, since descriptions are short and often not English
+SEARCH_CONFIG = "simple"
+
 
 class User(Base):
     __tablename__ = "users"
@@ -30,6 +39,11 @@ class User(Base):
     )
     hashed_password: Mapped[str] = mapped_column(String(255), nullable=False)
     created_at: Mapped[datetime] = mapped_column(default=func.now())
+    # Bumped with every write to the user's transactions; drives the ETags of
+    # the user's reads
+    data_version: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, server_default="0"
+    )
 
     # Relationships
     transactions: Mapped[list["Transaction"]] = relationship(
@@ -44,19 +58,95 @@ class Transaction(Base):
         UUID(as_uuid=True), primary_key=True, default=uuid.uuid4
     )
     user_id: Mapped[uuid.UUID] = mapped_column(
-        UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, index=True
+        UUID(as_uuid=True), ForeignKey("users.id"), nullable=False
     )
     income: Mapped[bool] = mapped_column(
         Boolean, nullable=False
     )  # True for income, False for payment
-    time: Mapped[datetime] = mapped_column(
-        default=func.now(), nullable=False, index=True
-    )
+    # Python-side UTC default: matches the utcnow() cutoffs in crud.py and keeps
+    # a uniform format on SQLite, where keyset cursors compare it to bound values
+    time: Mapped[datetime] = mapped_column(default=datetime.utcnow, nullable=False)
     description: Mapped[str] = mapped_column(Text, nullable=False)
     amount: Mapped[float] = mapped_column(Numeric(15, 2), nullable=False)
-    type: Mapped[str] = mapped_column(String(50), nullable=False, index=True)
+    type: Mapped[str] = mapped_column(String(50), nullable=False)
 
     # Relationships
     user: Mapped["User"] = relationship("User", back_populates="transactions")
 
-    __table_args__ = (CheckConstraint("amount > 0", name="check_positive_amount"),)
+    # Every TransactionRepository query filters on user_id and walks time DESC,
+    # id DESC, optionally narrowed by type or income. Each index matches one of
+    # those shapes so the planner can read rows in order instead of sorting.
+    # Plans are checked by bench/query_plans.py.
+    __table_args__ = (
+        CheckConstraint("amount > 0", name="check_positive_amount"),
+        Index("ix_transactions_user_time_id", "user_id", "time", "id"),
+        Index("ix_transactions_user_type_time_id", "user_id", "type", "time", "id"),
+        Index("ix_transactions_user_income_time_id", "user_id", "income", "time", "id"),
+        # Description search (GET /transactions/search), scoped by user with
+        # btree_gin (migration 0006); SQLite uses the transactions_fts table
+        # from migration 0003 instead
+        Index(
+            "ix_transactions_user_description_fts",
+            "user_id",
+            text(f"to_tsvector('{SEARCH_CONFIG}', description)"),
+            postgresql_using="gin",
+        ).ddl_if(dialect="postgresql"),
+    )
+
+
+class TransactionDailyRollup(Base):
+    """Per-user daily totals, kept in step with every transaction write."""
+
+    __tablename__ = "transaction_daily_rollups"
+
+    user_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("users.id"), primary_key=True
+    )
+    day: Mapped[date] = mapped_column(primary_key=True)
+    type: Mapped[str] = mapped_column(String(50), primary_key=True)
+    income: Mapped[bool] = mapped_column(Boolean, primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    total: Mapped[float] = mapped_column(Numeric(15, 2), nullable=False, default=0)
+
+
+class AdviceCacheEntry(Base):
+    """Agent advice for one exact transaction dataset, reused until it changes."""
+
+    __tablename__ = "advice_cache"
+
+    user_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("users.id"), primary_key=True
+    )
+    days: Mapped[int] = mapped_column(Integer, primary_key=True)
+    output_format: Mapped[str] = mapped_column(String(10), primary_key=True)
+    # sha256 of the transactions sent to the agent
+    fingerprint: Mapped[str] = mapped_column(String(64), primary_key=True)
+    content: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        default=datetime.utcnow, nullable=False
+    )
+
+
+class AdviceJob(Base):
+    """Advice requested through POST /api/advice/jobs and produced in the
+    background; the result (text or audio) is kept until the job expires."""
+
+    __tablename__ = "advice_jobs"
+
+    id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), primary_key=True, default=uuid.uuid4
+    )
+    user_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("users.id"), nullable=False
+    )
+    # pending -> running -> succeeded | failed
+    status: Mapped[str] = mapped_column(String(10), nullable=False)
+    output_format: Mapped[str] = mapped_column(String(10), nullable=False)
+    content: Mapped[Optional[bytes]] = mapped_column(LargeBinary)
+    error: Mapped[Optional[str]] = mapped_column(Text)
+    created_at: Mapped[datetime] = mapped_column(
+        default=datetime.utcnow, nullable=False
+    )
+    finished_at: Mapped[Optional[datetime]] = mapped_column()
+
+    __table_args__ = (Index("ix_advice_jobs_user_created", "user_id", "created_at"),)
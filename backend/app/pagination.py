@@ -0,0 +1,56 @@
+import base64
+import json
+import uuid
+from datetime import datetime
+from typing import Literal, NamedTuple, Optional
+
+CursorDirection = Literal["next", "prev"]
+
+
+class Cursor(NamedTuple):
+    """Position of a row in the (time DESC, id DESC) listing order, or in the
+    (rank DESC, time DESC, id DESC) order of search results."""
+
+    time: datetime
+    id: uuid.UUID
+    direction: CursorDirection
+    rank: Optional[float] = None
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a client sends a cursor we did not issue."""
+
+
+def encode_cursor(
+    time: datetime,
+    id: uuid.UUID,
+    direction: CursorDirection,
+    rank: Optional[float] = None,
+) -> str:
+    """Encode a keyset position as an opaque, URL-safe token."""
+
+    data = {"t": time.isoformat(), "i": str(id), "d": direction}
+    if rank is not None:
+        data["r"] = rank
+    payload = json.dumps(data, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> Cursor:
+    """Decode a token produced by `encode_cursor`."""
+
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        direction = data["d"]
+        if direction not in ("next", "prev"):
+            raise ValueError(direction)
+        rank = data.get("r")
+        return Cursor(
+            time=datetime.fromisoformat(data["t"]),
+            id=uuid.UUID(data["i"]),
+            direction=direction,
+            rank=float(rank) if rank is not None else None,
+        )
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursorError("Invalid cursor") from e
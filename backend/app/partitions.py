@@ -0,0 +1,330 @@
+"""
+Monthly range partitioning of the transactions table on `time` (Postgres).
+
+With TRANSACTION_PARTITIONING on, the table is converted once on startup (or
+with `python -m app.partitions`) into a table partitioned by month, plus a
+default partition for rows outside every month partition. A background task
+keeps TRANSACTION_PARTITION_MONTHS_AHEAD months of partitions ready and, when
+TRANSACTION_RETENTION_MONTHS is set, detaches the partitions that are entirely
+older than that. Queries with a time cutoff (the `days` filters, keyset
+cursors) then only scan the months they can match.
+"""
+
+import asyncio
+import logging
+import re
+from datetime import date, datetime
+from typing import Any, Optional
+
+from sqlalchemy import Connection, delete, select, text, update
+
+from app.config import settings
+from app.database import MIGRATION_LOCK_ID, engine
+from app.models import Transaction, TransactionDailyRollup, User
+
+# Arbitrary key for the Postgres advisory lock held while maintaining partitions
+PARTITION_LOCK_ID = 7_316_541
+DEFAULT_PARTITION = "transactions_default"
+
+_PARTITION_NAME = re.compile(r"^transactions_p(\d{4})(\d{2})$")
+
+
+def partition_name(month: date) -> str:
+    return f"transactions_p{month:%Y%m}"
+
+
+def is_partition_table(name: str) -> bool:
+    return name == DEFAULT_PARTITION or _PARTITION_NAME.match(name) is not None
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _current_month() -> date:
+    return datetime.utcnow().date().replace(day=1)
+
+
+def is_partitioned(connection: Connection) -> bool:
+    return connection.execute(
+        text(
+            "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table "
+            "WHERE partrelid = to_regclass('transactions'))"
+        )
+    ).scalar_one()
+
+
+def _partitions(connection: Connection) -> dict[date, str]:
+    """Attached month partitions by their first day."""
+    names = connection.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = 'transactions'::regclass"
+        )
+    ).scalars()
+    partitions = {}
+    for name in names:
+        match = _PARTITION_NAME.match(name)
+        if match:
+            partitions[date(int(match[1]), int(match[2]), 1)] = name
+    return partitions
+
+
+def _create_partition(connection: Connection, month: date) -> str:
+    """Create and attach the partition for `month`, first moving its rows out of
+    the default partition (attaching fails while the default holds any)."""
+    name = partition_name(month)
+    lower, upper = month, _add_months(month, 1)
+    connection.execute(
+        text(
+            f"CREATE TABLE {name} "
+            "(LIKE transactions INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        )
+    )
+    connection.execute(
+        text(
+            f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} "
+            "WHERE time >= :lower AND time < :upper RETURNING *) "
+            f"INSERT INTO {name} SELECT * FROM moved"
+        ),
+        {"lower": lower, "upper": upper},
+    )
+    connection.execute(
+        text(
+            f"ALTER TABLE transactions ATTACH PARTITION {name} "
+            f"FOR VALUES FROM ('{lower}') TO ('{upper}')"
+        )
+    )
+    return name
+
+
+def partition_transactions(connection: Connection, months_ahead: int) -> bool:
+    """
+    Convert `transactions` into a partitioned table, copying its rows.
+
+    Partitions cover every month from the oldest transaction up to
+    `months_ahead` months from now. The table is locked for the duration, so
+    run this before serving traffic. Returns False if it already was converted.
+    """
+    if is_partitioned(connection):
+        return False
+    connection.execute(text("LOCK TABLE transactions IN ACCESS EXCLUSIVE MODE"))
+    oldest = connection.execute(text("SELECT min(time) FROM transactions")).scalar()
+
+    # Free the names the partitioned table's PK and indexes take over
+    connection.execute(text("ALTER TABLE transactions RENAME TO transactions_old"))
+    connection.execute(
+        text("ALTER INDEX transactions_pkey RENAME TO transactions_old_pkey")
+    )
+    for index in Transaction.__table__.indexes:
+        connection.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+
+    connection.execute(
+        text(
+            "CREATE TABLE transactions "
+            "(LIKE transactions_old INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+            "PARTITION BY RANGE (time)"
+        )
+    )
+    # Unique constraints on a partitioned table must include the partition key
+    connection.execute(
+        text(
+            "ALTER TABLE transactions "
+            "ADD CONSTRAINT transactions_pkey PRIMARY KEY (id, time)"
+        )
+    )
+    connection.execute(
+        text(
+            "ALTER TABLE transactions ADD CONSTRAINT transactions_user_id_fkey "
+            "FOREIGN KEY (user_id) REFERENCES users (id)"
+        )
+    )
+    for index in Transaction.__table__.indexes:
+        index.create(connection)
+    connection.execute(
+        text(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF transactions DEFAULT")
+    )
+
+    current = _current_month()
+    month = min(oldest.date().replace(day=1), current) if oldest else current
+    while month <= _add_months(current, months_ahead):
+        _create_partition(connection, month)
+        month = _add_months(month, 1)
+
+    connection.execute(text("INSERT INTO transactions SELECT * FROM transactions_old"))
+    connection.execute(text("DROP TABLE transactions_old"))
+    return True
+
+
+def create_partitions(connection: Connection, months_ahead: int) -> list[str]:
+    """Create the missing partitions from this month to `months_ahead` ahead."""
+    existing = _partitions(connection)
+    current = _current_month()
+    return [
+        _create_partition(connection, month)
+        for month in (_add_months(current, i) for i in range(months_ahead + 1))
+        if month not in existing
+    ]
+
+
+def detach_expired_partitions(
+    connection: Connection, retention_months: int, drop: bool
+) -> list[str]:
+    """
+    Detach the partitions that end before the retention cutoff, the first day
+    of the month `retention_months` before this one, and drop them if `drop`.
+
+    Older rows in the default partition are deleted, and so are the daily
+    rollups before the cutoff, so counts and summaries match what is left.
+    The data version of every user who loses rows is bumped, like a write,
+    so cached counts and ETags of their listings are not reused.
+    Detached tables keep their name and can be archived, then dropped.
+    """
+    cutoff = _add_months(_current_month(), -retention_months)
+    expired = [
+        name
+        for month, name in sorted(_partitions(connection).items())
+        if _add_months(month, 1) <= cutoff
+    ]
+    # Every transaction has a rollup row, so these are the users losing rows
+    connection.execute(
+        update(User)
+        .filter(
+            User.id.in_(
+                select(TransactionDailyRollup.user_id)
+                .filter(TransactionDailyRollup.day < cutoff)
+                .distinct()
+            )
+        )
+        .values(data_version=User.data_version + 1)
+    )
+    for name in expired:
+        connection.execute(text(f"ALTER TABLE transactions DETACH PARTITION {name}"))
+        if drop:
+            connection.execute(text(f"DROP TABLE {name}"))
+    connection.execute(
+        text(f"DELETE FROM {DEFAULT_PARTITION} WHERE time < :cutoff"),
+        {"cutoff": cutoff},
+    )
+    connection.execute(
+        delete(TransactionDailyRollup).filter(TransactionDailyRollup.day < cutoff)
+    )
+    return expired
+
+
+def _enabled() -> bool:
+    if not settings.transaction_partitioning:
+        return False
+    if engine.dialect.name != "postgresql":
+        logging.warning("TRANSACTION_PARTITIONING needs Postgres; ignoring it")
+        return False
+    return True
+
+
+async def ensure_partitioning(convert: Optional[bool] = None):
+    """
+    Check that transactions is partitioned when TRANSACTION_PARTITIONING is on.
+
+    An unpartitioned table is converted when `convert` (by default
+    DB_AUTO_MIGRATE) is true; otherwise this raises, like `ensure_schema`.
+    """
+    if not _enabled():
+        return
+    async with engine.connect() as conn:
+        if await conn.run_sync(is_partitioned):
+            return
+    if not (settings.db_auto_migrate if convert is None else convert):
+        raise RuntimeError(
+            "TRANSACTION_PARTITIONING is on but transactions is not partitioned; "
+            "run `python -m app.partitions`"
+        )
+    logging.info("Converting transactions into a partitioned table")
+    async with engine.begin() as conn:
+        # Workers starting together wait here; the rest find it converted
+        await conn.execute(
+            text("SELECT pg_advisory_xact_lock(:id)"), {"id": MIGRATION_LOCK_ID}
+        )
+        await conn.run_sync(
+            partition_transactions, settings.transaction_partition_months_ahead
+        )
+
+
+class PartitionMaintainer:
+    """
+    Creates upcoming month partitions and applies the retention policy.
+
+    Every worker runs it, but a Postgres advisory lock lets only one of them
+    do each round's work.
+    """
+
+    def __init__(self):
+        self.runs = 0
+        self.created = 0
+        self.detached = 0
+        self.errors = 0
+        self.last_run: Optional[datetime] = None
+
+    async def run_once(self) -> bool:
+        """Do one round; returns False if another worker holds the lock."""
+        async with engine.begin() as conn:
+            locked = await conn.scalar(
+                text("SELECT pg_try_advisory_xact_lock(:id)"),
+                {"id": PARTITION_LOCK_ID},
+            )
+            if not locked:
+                return False
+            created = await conn.run_sync(
+                create_partitions, settings.transaction_partition_months_ahead
+            )
+            detached = []
+            if settings.transaction_retention_months is not None:
+                detached = await conn.run_sync(
+                    detach_expired_partitions,
+                    settings.transaction_retention_months,
+                    settings.transaction_retention_drop,
+                )
+        if created or detached:
+            logging.info(f"Partitions created: {created}, detached: {detached}")
+        self.runs += 1
+        self.created += len(created)
+        self.detached += len(detached)
+        self.last_run = datetime.utcnow()
+        return True
+
+    async def monitor(self):
+        """Run a round periodically; run as a background task."""
+        if not _enabled():
+            return
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                self.errors += 1
+                logging.warning(f"Transaction partition maintenance failed: {e}")
+            await asyncio.sleep(settings.transaction_partition_check_interval_seconds)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "enabled": settings.transaction_partitioning,
+            "runs": self.runs,
+            "created": self.created,
+            "detached": self.detached,
+            "errors": self.errors,
+            "last_run": self.last_run.isoformat() if self.last_run else None,
+        }
+
+
+partition_maintainer = PartitionMaintainer()
+
+
+async def _main():
+    await ensure_partitioning(convert=True)
+    if _enabled():
+        await partition_maintainer.run_once()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -2,17 +2,21 @@ import uuid
 from datetime import timedelta
 from typing import Optional
 
-from fastapi import APIRouter, Depends, Header, HTTPException, status
-from jose import JWTError, jwt
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings
 from app.crud import UserRepository
-from app.database import get_db
+from app.database import get_db, get_read_db
+from app.etags import content_etag, etag_headers, etag_matches, not_modified
 from app.models import User
 from app.schemas import User as UserSchema
 from app.schemas import UserLogin
-from app.security import create_access_token, decode_access_token, verify_password
+from app.security import (
+    create_access_token,
+    get_current_user_id,
+    verify_password_async,
+)
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -23,7 +27,9 @@ async def login_for_access_token(
 ):
     user_repo = UserRepository(db)
     user = await user_repo.get_user_by_username(username=form_data.username)
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user or not await verify_password_async(
+        form_data.password, user.hashed_password
+    ):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -37,35 +43,43 @@ async def login_for_access_token(
 
 
 async def get_current_user(
-    authorization: Optional[str] = Header(None), db: AsyncSession = Depends(get_db)
+    user_id: uuid.UUID = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_db),
 ) -> User:
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    if authorization is None:
-        raise credentials_exception
-    try:
-        scheme, token = authorization.split()
-        if scheme.lower() != "bearer":
-            raise credentials_exception
-        payload = decode_access_token(token)
-        if payload is None:
-            raise credentials_exception
-        user_id_str = payload.get("sub")
-        if user_id_str is None:
-            raise credentials_exception
-        user_id = uuid.UUID(user_id_str)
-    except (JWTError, ValueError):
-        raise credentials_exception
     user_repo = UserRepository(db)
-    user = await user_repo.get_user_by_id(user_id=user_id)
+    user = await user_repo.get_cached_user_by_id(user_id=user_id)
     if user is None:
-        raise credentials_exception
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     return user
 
 
 @router.get("/me", response_model=UserSchema)
-async def read_users_me(current_user: User = Depends(get_current_user)):
-    return current_user
+async def read_users_me(
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    user_id: uuid.UUID = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    The current user, read through the read session (the replica when it has
+    caught up) rather than from the user cache. Conditional on a hash of
+    the serialized user, since transaction writes do not change it.
+    """
+    user_repo = UserRepository(db)
+    current_user = await user_repo.get_user_by_id(user_id=user_id)
+    if current_user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    user = UserSchema.model_validate(current_user)
+    etag = content_etag(user.model_dump_json().encode())
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    response.headers.update(etag_headers(etag))
+    return user
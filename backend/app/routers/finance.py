@@ -1,65 +1,347 @@
+import hashlib
+import json
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Optional
+
 import httpx
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import Response
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi.responses import Response, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.background import BackgroundTask
 
+from app.admission import Admission, advice_admission
+from app.advice_jobs import AdviceJobRunner, get_advice_job_runner
+from app.agent_client import AgentClient, get_agent_client
 from app.config import settings
-from app.crud import TransactionRepository
-from app.database import get_db
-from app.models import User
+from app.crud import (
+    AdviceCacheRepository,
+    AdviceJobRepository,
+    TransactionRepository,
+)
+from app.database import async_session, get_db, get_read_db
+from app.models import AdviceJob, User
 from app.routers.auth import get_current_user
-from app.schemas import FinancialAdviceResponse, GetFinancialAdviceRequest
+from app.schemas import (
+    AdviceJobStatus,
+    FinancialAdviceResponse,
+    GetFinancialAdviceRequest,
+)
 
 router = APIRouter()
 
+AUDIO_HEADERS = {"Content-Disposition": "attachment; filename=advice.mp3"}
+EVENT_STREAM_HEADERS = {"Cache-Control": "no-cache"}
+# How long past the queue and agent timeouts an unfinished job counts as stale
+STALE_JOB_MARGIN_SECONDS = 60
+
 
 @router.post("/tip")
-async def get_tip(current_user: User = Depends(get_current_user)):
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                f"{settings.agent_base_url}/api/tip",
-                json={"user_uuid": str(current_user.id)},
-            )
-            response.raise_for_status()
-            tip_text = response.text
-            return {"tip": tip_text if tip_text else "No tip available"}
-        except httpx.RequestError as e:
-            raise HTTPException(status_code=500, detail=f"Error fetching tip: {str(e)}")
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+async def get_tip(
+    current_user: User = Depends(get_current_user),
+    agent: AgentClient = Depends(get_agent_client),
+):
+    try:
+        response = await agent.post(
+            "/api/tip",
+            json={"user_uuid": str(current_user.id)},
+            timeout=settings.agent_tip_timeout_seconds,
+        )
+        response.raise_for_status()
+        tip_text = response.text
+        return {"tip": tip_text if tip_text else "No tip available"}
+    except httpx.RequestError as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching tip: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
 
 @router.post("/advice", response_model=None)
 async def get_financial_advice(
     request: GetFinancialAdviceRequest,
     db: AsyncSession = Depends(get_db),
+    read_db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
+    agent: AgentClient = Depends(get_agent_client),
+    accept: Optional[str] = Header(None),
 ):
     """
     Generate personalized financial advice based on user's recent transaction records.
 
     This endpoint queries the database for recent transactions and forwards them
-    to the agent service to get financial advice.
+    to the agent service to get financial advice. Advice is cached per exact
+    transaction dataset until the user's transactions change.
 
     Args:
-        request: Request containing the number of recent days to analyze and output format
+        request: Request containing the number of recent days to analyze, output
+            format and whether to send recent transactions or per-category totals
+        accept: `text/event-stream` streams text advice from the agent as
+            server-sent events (`token` events, then `done` with the final
+            advice, or `error`)
 
     Returns:
-        JSON response for text format or Response with audio binary data
+        JSON response for text format or a StreamingResponse relaying the audio
+        or the advice events
 
     Raises:
         HTTPException: If the agent service call fails or database query fails
     """
+    stream_events = request.output_format == "text" and "text/event-stream" in (
+        accept or ""
+    )
     try:
-        # Get recent transactions from database
-        transaction_repo = TransactionRepository(db)
-        recent_transactions = await transaction_repo.get_recent_transactions_by_user(
-            user_id=current_user.id, days=request.days
+        agent_request_data, cache_key = await _prepare_advice(
+            request, current_user.id, read_db
         )
+        if settings.advice_cache_enabled:
+            cached = await AdviceCacheRepository(db).get(**cache_key)
+            if cached is not None:
+                if request.output_format == "audio":
+                    return Response(
+                        content=cached,
+                        media_type="audio/mpeg",
+                        headers=AUDIO_HEADERS,
+                    )
+                if stream_events:
+                    # Cached text advice is the agent's JSON string body
+                    advice = json.loads(cached)
+                    return Response(
+                        content=_sse("token", {"text": advice})
+                        + _sse("done", {"advice": advice}),
+                        media_type="text/event-stream",
+                        headers=EVENT_STREAM_HEADERS,
+                    )
+                return FinancialAdviceResponse(advice=cached.decode())
+
+        # Don't hold pooled DB connections for the length of the agent call
+        await read_db.close()
+        await db.close()
+        # Raises 429/503 at once when the agent is saturated
+        admission = await advice_admission.acquire(current_user.id)
 
-        # Limit the number of transactions
-        recent_transactions = recent_transactions[:50]
+        if stream_events:
+            # Relay the agent's events as they arrive, so the first words show
+            # up after the LLM's first token instead of the whole agent run
+            try:
+                response = await agent.post_stream(
+                    "/api/advice",
+                    json=agent_request_data,
+                    headers={"Accept": "text/event-stream"},
+                    timeout=settings.agent_advice_timeout_seconds,
+                )
+            except BaseException:
+                admission.release()
+                raise
+            return StreamingResponse(
+                _relay_events(agent, response, cache_key),
+                media_type="text/event-stream",
+                headers=EVENT_STREAM_HEADERS,
+                background=BackgroundTask(
+                    _finish_relay, response=response, admission=admission
+                ),
+            )
+
+        if request.output_format == "audio":
+            # Relay the audio as it arrives so playback can start right away
+            try:
+                response = await agent.post_stream(
+                    "/api/advice",
+                    json=agent_request_data,
+                    timeout=settings.agent_advice_timeout_seconds,
+                )
+            except BaseException:
+                admission.release()
+                raise
+            headers = dict(AUDIO_HEADERS)
+            content_length = response.headers.get("Content-Length")
+            if content_length and "Content-Encoding" not in response.headers:
+                headers["Content-Length"] = content_length
+            return StreamingResponse(
+                _relay_audio(agent, response, cache_key),
+                media_type="audio/mpeg",
+                headers=headers,
+                # Runs even if the client leaves before the body is streamed
+                background=BackgroundTask(
+                    _finish_relay, response=response, admission=admission
+                ),
+            )
+
+        async with admission:
+            response = await agent.post(
+                "/api/advice",
+                json=agent_request_data,
+                timeout=settings.agent_advice_timeout_seconds,
+            )
+        response.raise_for_status()
+
+        # Return text response as JSON
+        advice_text = response.text
+        if advice_text and settings.advice_cache_enabled:
+            await AdviceCacheRepository(db).put(
+                **cache_key, content=advice_text.encode()
+            )
+        return FinancialAdviceResponse(
+            advice=advice_text if advice_text else "No advice available"
+        )
+
+    except HTTPException:
+        raise
+    except httpx.RequestError as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching advice: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+
+
+@router.post(
+    "/advice/jobs",
+    response_model=AdviceJobStatus,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def create_advice_job(
+    request: GetFinancialAdviceRequest,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    read_db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
+    agent: AgentClient = Depends(get_agent_client),
+    runner: AdviceJobRunner = Depends(get_advice_job_runner),
+):
+    """
+    Start generating financial advice in the background.
+
+    Takes the same request as POST /api/advice but returns at once with a job
+    to poll at GET /api/advice/jobs/{id} (also given in the Location header),
+    so a slow agent call does not hold the client's connection open. Cached
+    advice gives a job that has already succeeded. Jobs wait for an agent
+    slot in the background; one that times out waiting fails.
+
+    Raises:
+        HTTPException: 429/503 with Retry-After when the user already has too
+            many advice requests or the queue is full
+    """
+    agent_request_data, cache_key = await _prepare_advice(
+        request, current_user.id, read_db
+    )
+    await read_db.close()
+    job_repo = AdviceJobRepository(db)
+    cached = None
+    if settings.advice_cache_enabled:
+        cached = await AdviceCacheRepository(db).get(**cache_key)
+
+    if cached is not None:
+        job = await job_repo.create_job(
+            current_user.id, request.output_format, content=cached
+        )
+    else:
+        # Jobs take the same slots as synchronous advice requests, but only
+        # join the queue here; the runner waits for the slot
+        admission = advice_admission.enqueue(current_user.id)
+        try:
+            job = await job_repo.create_job(current_user.id, request.output_format)
+        except BaseException:
+            admission.release()
+            raise
+        runner.submit(job.id, agent, admission, agent_request_data, cache_key)
+
+    response.headers["Location"] = f"/api/advice/jobs/{job.id}"
+    return _job_status(job)
+
+
+@router.get("/advice/jobs/{job_id}", response_model=AdviceJobStatus)
+async def read_advice_job(
+    job_id: uuid.UUID,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Poll an advice job. While it is pending or running the response carries a
+    Retry-After header; once succeeded it has the text advice or an audio_url.
+    """
+    job = await _get_job(db, job_id, current_user.id)
+    if job.status in ("pending", "running"):
+        response.headers["Retry-After"] = "1"
+    return _job_status(job)
+
+
+@router.get("/advice/jobs/{job_id}/audio")
+async def read_advice_job_audio(
+    job_id: uuid.UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Download the audio of a succeeded audio advice job."""
+    job = await _get_job(db, job_id, current_user.id)
+    if job.output_format != "audio" or job.status != "succeeded":
+        raise HTTPException(status_code=404, detail="Advice audio not found")
+    return Response(content=job.content, media_type="audio/mpeg", headers=AUDIO_HEADERS)
+
+
+async def _get_job(db: AsyncSession, job_id: uuid.UUID, user_id: uuid.UUID):
+    # Jobs are read from the primary: they change while being polled
+    job = await AdviceJobRepository(db).get_job(job_id, user_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Advice job not found")
+    return job
+
+
+def _job_status(job: AdviceJob) -> AdviceJobStatus:
+    job_status = AdviceJobStatus(
+        id=job.id,
+        status=job.status,
+        output_format=job.output_format,
+        created_at=job.created_at,
+        finished_at=job.finished_at,
+        error=job.error,
+    )
+    if job.status in ("pending", "running"):
+        # A worker that died mid-job never finishes it; stop it looking alive
+        deadline = job.created_at + timedelta(
+            seconds=settings.advice_queue_timeout_seconds
+            + settings.agent_advice_timeout_seconds
+            + STALE_JOB_MARGIN_SECONDS
+        )
+        if datetime.utcnow() > deadline:
+            job_status.status = "failed"
+            job_status.error = "Advice job was interrupted"
+    elif job.status == "succeeded":
+        if job.output_format == "audio":
+            job_status.audio_url = f"/api/advice/jobs/{job.id}/audio"
+        else:
+            job_status.advice = job.content.decode() or "No advice available"
+    return job_status
+
+
+async def _prepare_advice(
+    request: GetFinancialAdviceRequest, user_id: uuid.UUID, read_db: AsyncSession
+) -> tuple[dict[str, Any], dict[str, Any]]:
+    """Read the dataset the agent gets; returns the agent request body and the
+    advice cache key for it."""
+    transaction_repo = TransactionRepository(read_db)
+    if request.dataset == "by_category":
+        # Totals come from the daily rollups, so their cost does not grow
+        # with the number of transactions in the window
+        start = (datetime.utcnow() - timedelta(days=request.days)).date()
+        totals = await transaction_repo.get_rollup_totals_by_user(
+            user_id=user_id, start=start
+        )
+        transaction_data = [
+            {
+                "income": row.income,
+                "description": f"Total of {row.count} transactions",
+                "amount": float(row.total),
+                "type": row.type,
+            }
+            for row in totals
+            if row.total > 0
+        ]
+    else:
+        # Get the most recent transactions, limited in the query itself
+        recent_transactions = await transaction_repo.get_advice_transactions_by_user(
+            user_id=user_id,
+            days=request.days,
+            limit=settings.advice_transaction_limit,
+        )
 
         # Convert transactions to the format expected by the agent
         transaction_data = [
@@ -72,36 +354,86 @@ async def get_financial_advice(
             for transaction in recent_transactions
         ]
 
-        # Prepare request data for agent service
-        agent_request_data = {
-            "user_uuid": str(current_user.id),
-            "transactions": transaction_data,
-            "output_format": request.output_format,
-        }
+    # Prepare request data for agent service
+    agent_request_data = {
+        "user_uuid": str(user_id),
+        "transactions": transaction_data,
+        "output_format": request.output_format,
+    }
 
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{settings.agent_base_url}/api/advice",
-                json=agent_request_data,
-                timeout=120,
-            )
-            response.raise_for_status()
-
-            if request.output_format == "audio":
-                # Return audio binary data with appropriate content type
-                return Response(
-                    content=response.content,
-                    media_type="audio/mpeg",
-                    headers={"Content-Disposition": "attachment; filename=advice.mp3"},
-                )
-            else:
-                # Return text response as JSON
-                advice_text = response.text
-                return FinancialAdviceResponse(
-                    advice=advice_text if advice_text else "No advice available"
-                )
+    # Advice only depends on the dataset, so an unchanged one can be reused
+    cache_key = {
+        "user_id": user_id,
+        "days": request.days,
+        "output_format": request.output_format,
+        "fingerprint": _fingerprint(agent_request_data),
+    }
+    return agent_request_data, cache_key
 
-    except httpx.RequestError as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching advice: {str(e)}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+
+def _fingerprint(agent_request_data: dict[str, Any]) -> str:
+    payload = json.dumps(agent_request_data, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+async def _relay_audio(
+    agent: AgentClient, response: httpx.Response, cache_key: dict[str, Any]
+) -> AsyncIterator[bytes]:
+    """Relay streamed audio, keeping a copy for the cache while it stays small."""
+    buffer: bytearray | None = bytearray() if settings.advice_cache_enabled else None
+    async for chunk in agent.iter_stream(response):
+        if buffer is not None:
+            buffer += chunk
+            if len(buffer) > settings.advice_cache_max_bytes:
+                buffer = None
+        yield chunk
+
+    if buffer:
+        # The request's session is closed by the time the body is sent
+        async with async_session() as session:
+            await AdviceCacheRepository(session).put(**cache_key, content=bytes(buffer))
+
+
+async def _relay_events(
+    agent: AgentClient, response: httpx.Response, cache_key: dict[str, Any]
+) -> AsyncIterator[bytes]:
+    """Relay the agent's advice events, caching the advice if the stream
+    completes."""
+    buffer: bytearray | None = bytearray() if settings.advice_cache_enabled else None
+    async for chunk in agent.iter_stream(response):
+        if buffer is not None:
+            buffer += chunk
+            if len(buffer) > settings.advice_cache_max_bytes:
+                buffer = None
+        yield chunk
+
+    advice = _advice_from_events(bytes(buffer)) if buffer else None
+    if advice:
+        async with async_session() as session:
+            # Stored like the agent's JSON response, so both modes share it
+            content = json.dumps(advice, ensure_ascii=False).encode()
+            await AdviceCacheRepository(session).put(**cache_key, content=content)
+
+
+def _sse(event: str, data: dict[str, Any]) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode()
+
+
+def _advice_from_events(body: bytes) -> Optional[str]:
+    """The advice of a complete advice event stream: the final advice its
+    `done` event carries, which unlike the `token` events leaves out text the
+    LLM wrote before calling tools; joined tokens if an older agent sent none."""
+    tokens = []
+    for block in body.decode().replace("\r\n", "\n").split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.split("\n") if ": " in line)
+        if fields.get("event") == "token":
+            tokens.append(json.loads(fields["data"])["text"])
+        elif fields.get("event") == "done":
+            advice = json.loads(fields["data"]).get("advice")
+            return advice if advice is not None else "".join(tokens).strip()
+    return None
+
+
+async def _finish_relay(response: httpx.Response, admission: Admission):
+    admission.release()
+    await response.aclose()
@@ -1,4 +1,9 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Request
+
+from app.admission import advice_admission
+from app.crud import count_cache, user_cache
+from app.database import pool_stats, replica_router
+from app.partitions import partition_maintainer
 
 router = APIRouter(prefix="/health", tags=["health"])
 
@@ -6,3 +11,23 @@ router = APIRouter(prefix="/health", tags=["health"])
 @router.get("/")
 async def health_check():
     return {"status": "ok"}
+
+
+@router.get("/stats")
+async def health_stats(request: Request):
+    """Per-worker runtime counters."""
+    return {
+        "user_cache": user_cache.stats(),
+        "count_cache": count_cache.stats(),
+        "agent_client": request.app.state.agent_client.stats(),
+        "db_pool": pool_stats(),
+        "db_replica": replica_router.stats(),
+        "advice_admission": advice_admission.stats(),
+        "advice_jobs": request.app.state.advice_jobs.stats(),
+        "transaction_partitions": partition_maintainer.stats(),
+        "write_queue": (
+            request.app.state.write_queue.stats()
+            if request.app.state.write_queue is not None
+            else None
+        ),
+    }
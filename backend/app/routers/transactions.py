@@ -1,21 +1,37 @@
 import math
 import uuid
-from typing import Optional
+from datetime import date, datetime, timedelta
+from typing import Literal, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy import Row
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.crud import TransactionRepository
-from app.database import get_db
+from app import transaction_export
+from app.crud import TransactionRepository, UserRepository
+from app.database import get_db, get_read_db
+from app.etags import etag_headers, etag_matches, make_etag, not_modified
 from app.models import User
+from app.pagination import InvalidCursorError, decode_cursor, encode_cursor
 from app.routers.auth import get_current_user
 from app.schemas import (
+    AnalyticsBucket,
+    AnalyticsPoint,
+    BulkImportResult,
+    CategoryTotal,
     PaginatedTransactions,
     PaginationMetadata,
     Transaction,
+    TransactionAnalytics,
     TransactionCreate,
+    TransactionSummary,
     TransactionUpdate,
 )
+from app.serialization import encode_transaction_page
+from app.transaction_export import ExportFormat
+from app.transaction_import import CONTENT_TYPES, ImportFormat, import_transactions
+from app.write_queue import TransactionWriteQueue, get_write_queue
 
 router = APIRouter(prefix="/transactions", tags=["transactions"])
 
@@ -25,19 +41,255 @@ async def create_transaction(
     transaction: TransactionCreate,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
+    write_queue: Optional[TransactionWriteQueue] = Depends(get_write_queue),
 ):
+    if write_queue is not None:
+        # Don't hold a pooled connection while waiting for the batch to commit
+        await db.close()
+        return await write_queue.submit(
+            user_id=current_user.id, transaction=transaction
+        )
     transaction_repo = TransactionRepository(db)
     return await transaction_repo.create_transaction(
         user_id=current_user.id, transaction=transaction
     )
 
 
+@router.post(
+    "/bulk",
+    response_model=BulkImportResult,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/x-ndjson": {"schema": {"type": "string"}},
+                "text/csv": {"schema": {"type": "string"}},
+            },
+        }
+    },
+)
+async def bulk_import_transactions(
+    request: Request,
+    format: Optional[ImportFormat] = Query(
+        None, description="Body format; defaults to the request Content-Type"
+    ),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Import many transactions from a streamed NDJSON or CSV body.
+
+    Each line (after the CSV header) is one transaction with income, description,
+    amount, type and an optional ISO time. Rows that fail validation or insertion
+    are reported by row number; the rest are still imported.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0]
+    fmt = format or CONTENT_TYPES.get(content_type.strip().lower())
+    if fmt is None:
+        raise HTTPException(
+            status_code=415,
+            detail="Send NDJSON (application/x-ndjson) or CSV (text/csv)",
+        )
+    transaction_repo = TransactionRepository(db)
+    return await import_transactions(
+        transaction_repo, user_id=current_user.id, stream=request.stream(), fmt=fmt
+    )
+
+
+@router.get("/export")
+async def export_transactions(
+    format: ExportFormat = Query("ndjson", description="ndjson or csv"),
+    income: Optional[bool] = Query(
+        None, description="Filter by income (true) or expense (false)"
+    ),
+    type: Optional[str] = Query(None, description="Filter by transaction type"),
+    days: Optional[int] = Query(
+        None, ge=1, description="Filter transactions from the last X days"
+    ),
+    current_user: User = Depends(get_current_user),
+):
+    """Stream the user's full transaction history, most recent first."""
+    return StreamingResponse(
+        transaction_export.export_transactions(
+            user_id=current_user.id, fmt=format, income=income, type=type, days=days
+        ),
+        media_type=transaction_export.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f"attachment; filename=transactions.{format}"},
+    )
+
+
+@router.get("/summary", response_model=TransactionSummary)
+async def read_transaction_summary(
+    start: Optional[date] = Query(None, description="First day to include (UTC)"),
+    end: Optional[date] = Query(None, description="Last day to include (UTC)"),
+    days: Optional[int] = Query(
+        None, ge=1, description="Shortcut for start = today - days; ignored if start"
+    ),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Income, expense, net and per-category totals for a date range.
+
+    Answered from the daily rollups, so the cost depends on the number of days
+    and categories in the range, not on how many transactions the user has.
+    """
+    if start is None and days is not None:
+        start = (datetime.utcnow() - timedelta(days=days)).date()
+    transaction_repo = TransactionRepository(db)
+    totals = await transaction_repo.get_rollup_totals_by_user(
+        user_id=current_user.id, start=start, end=end
+    )
+
+    by_category = [
+        CategoryTotal(
+            type=row.type, income=row.income, count=row.count, total=float(row.total)
+        )
+        for row in totals
+    ]
+    income_total = sum(c.total for c in by_category if c.income)
+    expense_total = sum(c.total for c in by_category if not c.income)
+    return TransactionSummary(
+        start=start,
+        end=end,
+        income=round(income_total, 2),
+        expense=round(expense_total, 2),
+        net=round(income_total - expense_total, 2),
+        count=sum(c.count for c in by_category),
+        by_category=by_category,
+    )
+
+
+@router.get("/analytics", response_model=TransactionAnalytics)
+async def read_transaction_analytics(
+    bucket: AnalyticsBucket = Query("day", description="day, week or month"),
+    group_by: Optional[Literal["type"]] = Query(
+        None, description="Split each bucket per transaction type"
+    ),
+    start: Optional[date] = Query(None, description="First day to include (UTC)"),
+    end: Optional[date] = Query(None, description="Last day to include (UTC)"),
+    days: Optional[int] = Query(
+        None, ge=1, description="Shortcut for start = today - days; ignored if start"
+    ),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Income and expense series per day, week (from Monday) or month, for charts.
+
+    Aggregated in the database from the daily rollups; buckets without any
+    transactions are left out.
+    """
+    if start is None and days is not None:
+        start = (datetime.utcnow() - timedelta(days=days)).date()
+    transaction_repo = TransactionRepository(db)
+    rows = await transaction_repo.get_rollup_series_by_user(
+        user_id=current_user.id,
+        bucket=bucket,
+        by_type=group_by == "type",
+        start=start,
+        end=end,
+    )
+    return TransactionAnalytics(
+        bucket=bucket,
+        group_by=group_by,
+        start=start,
+        end=end,
+        series=[
+            AnalyticsPoint(
+                bucket=row.bucket,
+                type=row.type if group_by == "type" else None,
+                income=round(float(row.income or 0), 2),
+                expense=round(float(row.expense or 0), 2),
+                count=row.count,
+            )
+            for row in rows
+        ],
+    )
+
+
+@router.get("/search", response_model=PaginatedTransactions)
+async def search_transactions(
+    q: str = Query(
+        ..., min_length=1, max_length=200, description="Words to find in descriptions"
+    ),
+    page_size: int = Query(
+        10, ge=1, le=100, description="Number of items per page (max 100)"
+    ),
+    cursor: Optional[str] = Query(
+        None, description="Opaque next_cursor/prev_cursor from a previous response"
+    ),
+    income: Optional[bool] = Query(
+        None, description="Filter by income (true) or expense (false)"
+    ),
+    type: Optional[str] = Query(None, description="Filter by transaction type"),
+    days: Optional[int] = Query(
+        None, ge=1, description="Filter transactions from the last X days"
+    ),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Search transaction descriptions, best match first, then most recent.
+
+    Every word of `q` has to appear in the description, as a word or the start
+    of one. Uses a full-text index rather than scanning the user's rows, and
+    pages with cursors like `pagination=cursor` listings (no totals).
+    """
+    try:
+        position = decode_cursor(cursor) if cursor is not None else None
+        if position is not None and position.rank is None:
+            raise InvalidCursorError("Invalid cursor")
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    transaction_repo = TransactionRepository(db)
+    transactions, has_more = await transaction_repo.search_transactions_by_user(
+        user_id=current_user.id,
+        q=q,
+        cursor=position,
+        limit=page_size,
+        income=income,
+        type=type,
+        days=days,
+    )
+
+    if position is not None and position.direction == "prev":
+        has_next, has_previous = True, has_more
+    else:
+        has_next, has_previous = has_more, position is not None
+
+    metadata = PaginationMetadata(
+        page_size=page_size,
+        has_next=has_next,
+        has_previous=has_previous,
+        next_cursor=_cursor_after(transactions) if has_next else None,
+        prev_cursor=_cursor_before(transactions) if has_previous else None,
+    )
+
+    # Drop the trailing rank column; the items are plain transactions
+    return Response(
+        encode_transaction_page([row[:-1] for row in transactions], metadata),
+        media_type="application/json",
+    )
+
+
 @router.get("/", response_model=PaginatedTransactions)
 async def read_transactions(
+    request: Request,
     page: int = Query(1, ge=1, description="Page number starting from 1"),
     page_size: int = Query(
         10, ge=1, le=100, description="Number of items per page (max 100)"
     ),
+    pagination: Literal["offset", "cursor"] = Query(
+        "offset",
+        description="Use 'cursor' for keyset pagination (no page numbers or totals)",
+    ),
+    cursor: Optional[str] = Query(
+        None,
+        description="Opaque next_cursor/prev_cursor from a previous response; "
+        "implies cursor pagination",
+    ),
     income: Optional[bool] = Query(
         None, description="Filter by income (true) or expense (false)"
     ),
@@ -45,31 +297,82 @@ async def read_transactions(
     days: Optional[int] = Query(
         None, ge=1, description="Filter transactions from the last X days"
     ),
-    db: AsyncSession = Depends(get_db),
+    exact: bool = Query(
+        True,
+        description="false skips counting: total_items/total_pages are only "
+        "filled in when the count is already cached, has_next always is",
+    ),
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
 ):
+    """
+    List the user's transactions, most recent first.
+
+    Responses carry a strong ETag from the user's data version and the query,
+    and a matching If-None-Match gets a 304 after a single version lookup.
+    Not for `days` (rows age out of the window without a write) or for
+    offset pages with exact=false (their totals can be older than the
+    version). exact=true totals are checked against that same version.
+    """
+    cursor_mode = pagination == "cursor" or cursor is not None
+    etag = version = None
+    if days is None and (exact or cursor_mode):
+        version = await UserRepository(db).get_data_version(current_user.id)
+        etag = make_etag(
+            current_user.id, version, sorted(request.query_params.multi_items())
+        )
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+
     transaction_repo = TransactionRepository(db)
 
+    if cursor_mode:
+        response = await _read_transactions_by_cursor(
+            transaction_repo,
+            user_id=current_user.id,
+            cursor=cursor,
+            page_size=page_size,
+            income=income,
+            type=type,
+            days=days,
+        )
+        return _with_etag(response, etag)
+
     # Convert page/page_size to skip/limit
     skip = (page - 1) * page_size
 
-    # Get transactions and total count
+    # One extra row tells whether a next page exists without a count
     transactions = await transaction_repo.get_transactions_by_user(
         user_id=current_user.id,
         skip=skip,
-        limit=page_size,
+        limit=page_size + 1,
         income=income,
         type=type,
         days=days,
     )
-    total_count = await transaction_repo.get_transactions_count_by_user(
-        user_id=current_user.id, income=income, type=type, days=days
-    )
+    has_next = len(transactions) > page_size
+    transactions = transactions[:page_size]
+    has_previous = page > 1
+
+    if exact:
+        total_count = await transaction_repo.get_transactions_count_by_user(
+            user_id=current_user.id,
+            income=income,
+            type=type,
+            days=days,
+            version=version,
+        )
+    else:
+        total_count = transaction_repo.get_cached_transactions_count_by_user(
+            user_id=current_user.id, income=income, type=type, days=days
+        )
 
     # Calculate pagination metadata
-    total_pages = math.ceil(total_count / page_size) if total_count > 0 else 0
-    has_next = page < total_pages
-    has_previous = page > 1
+    if total_count is None:
+        total_pages = None
+    else:
+        total_pages = math.ceil(total_count / page_size) if total_count > 0 else 0
 
     metadata = PaginationMetadata(
         page=page,
@@ -78,20 +381,86 @@ async def read_transactions(
         total_pages=total_pages,
         has_next=has_next,
         has_previous=has_previous,
+        # Cursors let a client switch to keyset pagination from any page
+        next_cursor=_cursor_after(transactions) if has_next else None,
+        prev_cursor=_cursor_before(transactions) if has_previous else None,
     )
 
-    # Convert SQLAlchemy models to Pydantic schemas
-    transaction_schemas = [
-        Transaction.model_validate(transaction) for transaction in transactions
-    ]
+    # Rows go straight to JSON; response_model only documents the shape
+    response = Response(
+        encode_transaction_page(transactions, metadata), media_type="application/json"
+    )
+    return _with_etag(response, etag)
+
+
+def _with_etag(response: Response, etag: Optional[str]) -> Response:
+    if etag is not None:
+        response.headers.update(etag_headers(etag))
+    return response
 
-    return PaginatedTransactions(items=transaction_schemas, metadata=metadata)
+
+async def _read_transactions_by_cursor(
+    transaction_repo: TransactionRepository,
+    user_id: uuid.UUID,
+    cursor: Optional[str],
+    page_size: int,
+    income: Optional[bool],
+    type: Optional[str],
+    days: Optional[int],
+) -> Response:
+    try:
+        position = decode_cursor(cursor) if cursor is not None else None
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    transactions, has_more = await transaction_repo.get_transactions_by_user_keyset(
+        user_id=user_id,
+        cursor=position,
+        limit=page_size,
+        income=income,
+        type=type,
+        days=days,
+    )
+
+    # has_more only looks ahead in the direction we travelled; the way back is
+    # known to exist because the client arrived here through a cursor.
+    if position is not None and position.direction == "prev":
+        has_next, has_previous = True, has_more
+    else:
+        has_next, has_previous = has_more, position is not None
+
+    metadata = PaginationMetadata(
+        page_size=page_size,
+        has_next=has_next,
+        has_previous=has_previous,
+        next_cursor=_cursor_after(transactions) if has_next else None,
+        prev_cursor=_cursor_before(transactions) if has_previous else None,
+    )
+
+    return Response(
+        encode_transaction_page(transactions, metadata), media_type="application/json"
+    )
+
+
+def _cursor_after(transactions: list[Row]) -> Optional[str]:
+    if not transactions:
+        return None
+    last = transactions[-1]
+    # Search results also carry their rank
+    return encode_cursor(last.time, last.id, "next", getattr(last, "rank", None))
+
+
+def _cursor_before(transactions: list[Row]) -> Optional[str]:
+    if not transactions:
+        return None
+    first = transactions[0]
+    return encode_cursor(first.time, first.id, "prev", getattr(first, "rank", None))
 
 
 @router.get("/{transaction_id}", response_model=Transaction)
 async def read_transaction(
     transaction_id: uuid.UUID,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
 ):
     transaction_repo = TransactionRepository(db)
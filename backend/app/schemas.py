@@ -1,8 +1,8 @@
 import uuid
-from datetime import datetime
+from datetime import date, datetime
 from typing import Literal, Optional
 
-from pydantic import BaseModel, ConfigDict, EmailStr
+from pydantic import BaseModel, ConfigDict, EmailStr, Field
 
 
 # User schemas
@@ -39,6 +39,13 @@ class TransactionCreate(TransactionBase):
     pass
 
 
+class TransactionImport(TransactionCreate):
+    # Mirrors the DB constraints so a bulk insert chunk does not fail late
+    amount: float = Field(gt=0)
+    type: str = Field(max_length=50)
+    time: Optional[datetime] = None
+
+
 class TransactionUpdate(BaseModel):
     income: Optional[bool] = None
     description: Optional[str] = None
@@ -54,14 +61,68 @@ class Transaction(TransactionBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+class BulkImportError(BaseModel):
+    row: int
+    error: str
+
+
+class BulkImportResult(BaseModel):
+    imported: int
+    failed: int
+    # Capped; `failed` always holds the full count
+    errors: list[BulkImportError]
+
+
+class CategoryTotal(BaseModel):
+    type: str
+    income: bool
+    count: int
+    total: float
+
+
+class TransactionSummary(BaseModel):
+    start: Optional[date]
+    end: Optional[date]
+    income: float
+    expense: float
+    net: float
+    count: int
+    by_category: list[CategoryTotal]
+
+
+AnalyticsBucket = Literal["day", "week", "month"]
+
+
+class AnalyticsPoint(BaseModel):
+    # First day of the bucket; weeks start on Monday
+    bucket: date
+    # Only set when grouped by type
+    type: Optional[str] = None
+    income: float
+    expense: float
+    count: int
+
+
+class TransactionAnalytics(BaseModel):
+    bucket: AnalyticsBucket
+    group_by: Optional[Literal["type"]]
+    start: Optional[date]
+    end: Optional[date]
+    series: list[AnalyticsPoint]
+
+
 # Pagination schemas
 class PaginationMetadata(BaseModel):
-    page: int
+    # page is only known in offset mode; total_* only when counted, i.e. in
+    # offset mode with exact=true or a cached count. Cursor mode never counts.
+    page: Optional[int] = None
     page_size: int
-    total_items: int
-    total_pages: int
+    total_items: Optional[int] = None
+    total_pages: Optional[int] = None
     has_next: bool
     has_previous: bool
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
 
 
 class PaginatedTransactions(BaseModel):
@@ -74,7 +135,21 @@ class GetFinancialAdviceRequest(BaseModel):
     user_uuid: uuid.UUID
     days: int
     output_format: Literal["text", "audio"]
+    # "recent": the latest transactions; "by_category": one total per category
+    dataset: Literal["recent", "by_category"] = "recent"
 
 
 class FinancialAdviceResponse(BaseModel):
     advice: str
+
+
+class AdviceJobStatus(BaseModel):
+    id: uuid.UUID
+    status: Literal["pending", "running", "succeeded", "failed"]
+    output_format: Literal["text", "audio"]
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    # Set once succeeded: the text advice, or where to download the audio
+    advice: Optional[str] = None
+    audio_url: Optional[str] = None
+    error: Optional[str] = None
@@ -1,11 +1,21 @@
+import asyncio
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
+from fastapi import Header, HTTPException, status
 from jose import JWTError, jwt
 from passlib.hash import bcrypt
 
 from app.config import settings
 
+# bcrypt releases the GIL, so a small thread pool keeps hashing off the event
+# loop; its size caps how many hashes run at once, the rest queue up.
+password_executor = ThreadPoolExecutor(
+    max_workers=settings.password_hash_workers, thread_name_prefix="bcrypt"
+)
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash."""
@@ -14,7 +24,21 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 
 def get_password_hash(password: str) -> str:
     """Hash a password for storing."""
-    return bcrypt.hash(password, salt=settings.salt)
+    return bcrypt.hash(password, salt=settings.salt, rounds=settings.bcrypt_rounds)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password on the hashing pool without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        password_executor, verify_password, plain_password, hashed_password
+    )
+
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password on the hashing pool without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, get_password_hash, password)
 
 
 def create_access_token(
@@ -46,3 +70,28 @@ def decode_access_token(token: str) -> Dict[str, Any] | None:
         return payload
     except JWTError:
         return None
+
+
+async def get_current_user_id(authorization: Optional[str] = Header(None)) -> uuid.UUID:
+    """Dependency resolving the bearer token to a user id, without touching the DB."""
+
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    if authorization is None:
+        raise credentials_exception
+    try:
+        scheme, token = authorization.split()
+        if scheme.lower() != "bearer":
+            raise credentials_exception
+        payload = decode_access_token(token)
+        if payload is None:
+            raise credentials_exception
+        user_id_str = payload.get("sub")
+        if user_id_str is None:
+            raise credentials_exception
+        return uuid.UUID(user_id_str)
+    except (JWTError, ValueError):
+        raise credentials_exception
@@ -0,0 +1,75 @@
+import csv
+import io
+import json
+import uuid
+from typing import AsyncIterator, Literal, Optional
+
+from app.crud import TRANSACTION_COLUMNS, TransactionRepository
+from app.database import async_session
+
+ExportFormat = Literal["ndjson", "csv"]
+
+MEDIA_TYPES: dict[ExportFormat, str] = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+FIELDS = [column.key for column in TRANSACTION_COLUMNS]
+
+
+async def export_transactions(
+    user_id: uuid.UUID,
+    fmt: ExportFormat,
+    income: Optional[bool] = None,
+    type: Optional[str] = None,
+    days: Optional[int] = None,
+) -> AsyncIterator[bytes]:
+    """
+    Encode a user's transactions as NDJSON or CSV, one chunk per DB batch.
+
+    Opens its own session because the body is produced after the request
+    handler (and its session dependency) has returned.
+    """
+    async with async_session() as session:
+        transaction_repo = TransactionRepository(session)
+        if fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(FIELDS)
+            yield buffer.getvalue().encode()
+
+        async for rows in transaction_repo.stream_transactions_by_user(
+            user_id=user_id, income=income, type=type, days=days
+        ):
+            if fmt == "csv":
+                buffer.seek(0)
+                buffer.truncate()
+                writer.writerows(
+                    [
+                        row.id,
+                        row.user_id,
+                        "true" if row.income else "false",
+                        row.time.isoformat(),
+                        row.description,
+                        row.amount,
+                        row.type,
+                    ]
+                    for row in rows
+                )
+                yield buffer.getvalue().encode()
+            else:
+                yield "".join(
+                    json.dumps(
+                        {
+                            "id": str(row.id),
+                            "user_id": str(row.user_id),
+                            "income": row.income,
+                            "time": row.time.isoformat(),
+                            "description": row.description,
+                            "amount": float(row.amount),
+                            "type": row.type,
+                        }
+                    )
+                    + "\n"
+                    for row in rows
+                ).encode()
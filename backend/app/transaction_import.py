@@ -0,0 +1,142 @@
+import codecs
+import csv
+import json
+import uuid
+from datetime import timezone
+from typing import Any, AsyncIterator, Literal, Optional
+
+from pydantic import ValidationError
+
+from app.crud import TransactionRepository
+from app.schemas import BulkImportError, BulkImportResult, TransactionImport
+
+ImportFormat = Literal["ndjson", "csv"]
+
+CONTENT_TYPES: dict[str, ImportFormat] = {
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "application/json-lines": "ndjson",
+    "text/csv": "csv",
+}
+
+# Rows validated and inserted per round trip
+CHUNK_SIZE = 1000
+# Keep the response bounded when a whole file is malformed
+MAX_REPORTED_ERRORS = 1000
+
+
+async def _iter_lines(stream: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in stream:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+
+async def _iter_records(
+    stream: AsyncIterator[bytes], fmt: ImportFormat
+) -> AsyncIterator[tuple[int, dict[str, Any] | str]]:
+    """Yield (row number, raw record or parse error) pairs, skipping blank lines.
+
+    CSV input must have a header row and one record per line.
+    """
+    header: Optional[list[str]] = None
+    row_number = 0
+    async for line in _iter_lines(stream):
+        if not line.strip():
+            continue
+        if fmt == "csv":
+            values = next(csv.reader([line]))
+            if header is None:
+                header = [name.strip() for name in values]
+                continue
+            row_number += 1
+            if len(values) != len(header):
+                yield row_number, f"Expected {len(header)} columns, got {len(values)}"
+                continue
+            # Empty cells mean "not given", e.g. a missing time
+            yield row_number, {k: v for k, v in zip(header, values) if v != ""}
+        else:
+            row_number += 1
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield row_number, f"Invalid JSON: {e}"
+                continue
+            if not isinstance(record, dict):
+                yield row_number, "Expected a JSON object"
+                continue
+            yield row_number, record
+
+
+def _validate(record: dict[str, Any]) -> TransactionImport | str:
+    try:
+        row = TransactionImport.model_validate(record)
+    except ValidationError as e:
+        return "; ".join(
+            f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}"
+            for err in e.errors()
+        )
+    if row.time is not None and row.time.tzinfo is not None:
+        row.time = row.time.astimezone(timezone.utc).replace(tzinfo=None)
+    return row
+
+
+async def import_transactions(
+    transaction_repo: TransactionRepository,
+    user_id: uuid.UUID,
+    stream: AsyncIterator[bytes],
+    fmt: ImportFormat,
+) -> BulkImportResult:
+    """
+    Stream-parse an NDJSON or CSV body and insert its rows in chunks.
+
+    Invalid rows are reported and skipped. Each chunk of valid rows goes to the
+    database in one multi-row insert; if that insert fails the chunk is retried
+    row by row so only the offending rows are rejected.
+    """
+    result = BulkImportResult(imported=0, failed=0, errors=[])
+
+    def fail(row_number: int, error: str):
+        result.failed += 1
+        if len(result.errors) < MAX_REPORTED_ERRORS:
+            result.errors.append(BulkImportError(row=row_number, error=error))
+
+    async def flush(chunk: list[tuple[int, TransactionImport]]):
+        try:
+            result.imported += await transaction_repo.bulk_create_transactions(
+                user_id=user_id, transactions=[row for _, row in chunk]
+            )
+            return
+        except Exception:
+            await transaction_repo.db.rollback()
+
+        for row_number, row in chunk:
+            try:
+                result.imported += await transaction_repo.bulk_create_transactions(
+                    user_id=user_id, transactions=[row]
+                )
+            except Exception as e:
+                await transaction_repo.db.rollback()
+                fail(row_number, str(getattr(e, "orig", e)))
+
+    chunk: list[tuple[int, TransactionImport]] = []
+    async for row_number, record in _iter_records(stream, fmt):
+        row = _validate(record) if isinstance(record, dict) else record
+        if isinstance(row, str):
+            fail(row_number, row)
+            continue
+        chunk.append((row_number, row))
+        if len(chunk) >= CHUNK_SIZE:
+            await flush(chunk)
+            chunk = []
+    if chunk:
+        await flush(chunk)
+
+    return result
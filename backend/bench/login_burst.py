@@ -0,0 +1,123 @@
+"""
+Login-burst benchmark: do logins stall the rest of the API?
+
+Runs the app in-process on one event loop (like one uvicorn worker), keeps a
+steady stream of GET /api/auth/me requests going and measures their latency
+before and during a burst of concurrent POST /api/auth/token logins. With
+bcrypt on the hashing pool the p99 of the other requests should stay close to
+its baseline; --inline runs bcrypt on the event loop, as before, to compare.
+
+    uv run python -m bench.login_burst
+    uv run python -m bench.login_burst --inline
+
+Runs against --database-url (./bench.db by default), never DATABASE_URL; that
+database is dropped and recreated.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def probe(client, headers, stop: asyncio.Event, interval: float) -> list[float]:
+    latencies = []
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        response = await client.get("/api/auth/me", headers=headers)
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - t0) * 1000)
+        await asyncio.sleep(interval)
+    return latencies
+
+
+async def run(logins: int, seconds: float, interval: float, inline: bool):
+    import httpx
+    from sqlalchemy import text
+
+    from app.database import Base, engine
+    from app.main import app
+    from app.routers import auth
+    from app.security import verify_password
+
+    if inline:
+
+        async def verify_inline(plain_password: str, hashed_password: str) -> bool:
+            return verify_password(plain_password, hashed_password)
+
+        auth.verify_password_async = verify_inline
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        # Not in the metadata: SQLite's search index from migration 0003
+        for name in ("transactions_fts", "transactions_fts_ids", "alembic_version"):
+            await conn.execute(text(f"DROP TABLE IF EXISTS {name}"))
+
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app), httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        credentials = {"username": "bench", "password": "bench-password"}
+        await client.post(
+            "/api/users/", json={**credentials, "email": "bench@example.com"}
+        )
+        token = (await client.post("/api/auth/token", json=credentials)).json()
+        headers = {"Authorization": f"Bearer {token['access_token']}"}
+
+        stop = asyncio.Event()
+        baseline_task = asyncio.create_task(probe(client, headers, stop, interval))
+        await asyncio.sleep(seconds)
+        stop.set()
+        baseline = await baseline_task
+
+        stop = asyncio.Event()
+        burst_task = asyncio.create_task(probe(client, headers, stop, interval))
+        t0 = time.perf_counter()
+        responses = await asyncio.gather(
+            *(client.post("/api/auth/token", json=credentials) for _ in range(logins))
+        )
+        login_seconds = time.perf_counter() - t0
+        stop.set()
+        burst = await burst_task
+        assert all(r.status_code == 200 for r in responses)
+
+    mode = "inline bcrypt" if inline else "bcrypt on hashing pool"
+    rate = logins / login_seconds
+    print(f"{logins} logins in {login_seconds:.2f}s ({rate:.1f}/s), {mode}")
+    header = f"{'n':>5} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}"
+    print(f"{'GET /api/auth/me':<18} {header}")
+    for name, samples in (("baseline", baseline), ("during burst", burst)):
+        print(
+            f"{name:<18} {len(samples):>5} {statistics.median(samples):>8.2f} "
+            f"{percentile(samples, 99):>8.2f} {max(samples):>8.2f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--seconds", type=float, default=2.0, help="Baseline length")
+    parser.add_argument("--interval", type=float, default=0.005)
+    parser.add_argument("--inline", action="store_true")
+    parser.add_argument(
+        "--database-url",
+        default="sqlite+aiosqlite:///./bench.db",
+        help="Scratch database to use (dropped and recreated)",
+    )
+    args = parser.parse_args()
+
+    # The app reads its settings on import; override whatever the environment
+    # or backend/.env point at
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ["DATABASE_REPLICA_URL"] = ""
+    asyncio.run(run(args.logins, args.seconds, args.interval, args.inline))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+import json
 import random
 
 import httpx
@@ -6,7 +7,7 @@ import httpx
 TOKEN = open("test_data/.token").read().strip()
 
 # API endpoint
-URL = "http://localhost:8000/api/transactions/"
+URL = "http://localhost:8000/api/transactions/bulk"
 
 # Define transaction types and descriptions
 INCOME_TYPES = [
@@ -41,19 +42,31 @@ def generate_transaction():
     }
 
 
+def generate_ndjson(num_transactions):
+    for _ in range(num_transactions):
+        yield (json.dumps(generate_transaction()) + "\n").encode()
+
+
 def main(num_transactions=100):
-    with httpx.Client() as client:
-        for _ in range(num_transactions):
-            payload = generate_transaction()
-            headers = {"Authorization": f"bearer {TOKEN}"}
-            try:
-                response = client.post(URL, json=payload, headers=headers)
-                if response.status_code == 200:
-                    print(f"Posted transaction: {payload}")
-                else:
-                    print(f"Failed to post: {response.status_code} - {response.text}")
-            except Exception as e:
-                print(f"Error: {e}")
+    headers = {
+        "Authorization": f"bearer {TOKEN}",
+        "Content-Type": "application/x-ndjson",
+    }
+    with httpx.Client(timeout=None) as client:
+        try:
+            # Stream every row in one request instead of one POST per row
+            response = client.post(
+                URL, content=generate_ndjson(num_transactions), headers=headers
+            )
+            if response.status_code == 200:
+                result = response.json()
+                print(f"Imported {result['imported']} transactions")
+                for error in result["errors"]:
+                    print(f"Row {error['row']} failed: {error['error']}")
+            else:
+                print(f"Failed to post: {response.status_code} - {response.text}")
+        except Exception as e:
+            print(f"Error: {e}")
 
 
 if __name__ == "__main__":
@@ -1,14 +1,43 @@
+import os
+
 import uvicorn
 
-from app.main import app
+from app.config import settings
+
+# Imported up front so a broken app or bad settings fail here, once, before
+# any worker or reloader process is started; those import the app themselves
+from app.main import app  # noqa: F401
+
+# Workers when SERVER_WORKERS is unset: one per core, but no more than this, so
+# their pools (DB_POOL_SIZE + DB_MAX_OVERFLOW each, 15 by default) stay within
+# the max_connections=100 of docker-compose.yml on any host
+DEFAULT_MAX_WORKERS = 4
 
 
 def main():
     """Run the FastAPI application"""
+    if settings.server_mode == "production":
+        workers = settings.server_workers or min(
+            os.cpu_count() or 1, DEFAULT_MAX_WORKERS
+        )
+        uvicorn.run(
+            "app.main:app",
+            host=settings.server_host,
+            port=settings.server_port,
+            workers=workers,
+            loop=settings.server_loop,
+            http=settings.server_http,
+            timeout_graceful_shutdown=settings.server_graceful_shutdown_seconds,
+            timeout_keep_alive=settings.server_keep_alive_seconds,
+            access_log=settings.server_access_log,
+            log_level="debug" if settings.debug else "info",
+        )
+        return
+
     uvicorn.run(
-        app,
-        host="0.0.0.0",
-        port=8000,
+        "app.main:app",
+        host=settings.server_host,
+        port=settings.server_port,
         reload=True,
         log_level="debug",
     )
@@ -0,0 +1,70 @@
+import asyncio
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app import models  # noqa: F401  (registers the tables on Base.metadata)
+from app.config import settings
+from app.database import Base
+from app.partitions import is_partition_table
+
+config = context.config
+target_metadata = Base.metadata
+
+# The app passes its own connection when it migrates on startup; leave its
+# logging alone in that case
+connection = config.attributes.get("connection")
+if connection is None and config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+
+def include_name(name, type_, parent_names) -> bool:
+    """Leave the month partitions of transactions (see app.partitions) and the
+    SQLite FTS5 table and its shadow tables out of autogenerate comparisons."""
+    return not (
+        type_ == "table"
+        and (is_partition_table(name) or name.startswith("transactions_fts"))
+    )
+
+
+def run_migrations_offline() -> None:
+    """Emit the migration SQL without connecting (alembic upgrade --sql)."""
+    context.configure(
+        url=settings.database_url,
+        target_metadata=target_metadata,
+        include_name=include_name,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def do_run_migrations(connection: Connection) -> None:
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        include_name=include_name,
+        render_as_batch=connection.dialect.name == "sqlite",
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+async def run_async_migrations() -> None:
+    engine = create_async_engine(settings.database_url, poolclass=NullPool)
+    async with engine.connect() as connection:
+        await connection.run_sync(do_run_migrations)
+        await connection.commit()
+    await engine.dispose()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+elif connection is not None:
+    do_run_migrations(connection)
+else:
+    asyncio.run(run_async_migrations())
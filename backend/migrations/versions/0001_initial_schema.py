@@ -0,0 +1,162 @@
+"""Initial schema
+
+Creates every table the app used to build with create_all on startup. Tables
+and indexes that already exist are left alone, so databases created that way
+can be upgraded in place; their daily rollups are backfilled if missing.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 00:00:00
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TRANSACTION_INDEXES = {
+    "ix_transactions_user_time_id": ["user_id", "time", "id"],
+    "ix_transactions_user_type_time_id": ["user_id", "type", "time", "id"],
+    "ix_transactions_user_income_time_id": ["user_id", "income", "time", "id"],
+}
+
+# Single-column indexes from before the composite ones above
+LEGACY_TRANSACTION_INDEXES = [
+    "ix_transactions_user_id",
+    "ix_transactions_time",
+    "ix_transactions_type",
+]
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+
+    if "users" not in tables:
+        op.create_table(
+            "users",
+            sa.Column("id", sa.UUID(), nullable=False),
+            sa.Column("username", sa.String(length=50), nullable=False),
+            sa.Column("email", sa.String(length=255), nullable=False),
+            sa.Column("hashed_password", sa.String(length=255), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_users_username", "users", ["username"], unique=True)
+        op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    if "transactions" not in tables:
+        op.create_table(
+            "transactions",
+            sa.Column("id", sa.UUID(), nullable=False),
+            sa.Column("user_id", sa.UUID(), nullable=False),
+            sa.Column("income", sa.Boolean(), nullable=False),
+            sa.Column("time", sa.DateTime(), nullable=False),
+            sa.Column("description", sa.Text(), nullable=False),
+            sa.Column("amount", sa.Numeric(precision=15, scale=2), nullable=False),
+            sa.Column("type", sa.String(length=50), nullable=False),
+            sa.CheckConstraint("amount > 0", name="check_positive_amount"),
+            sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        existing_indexes = set()
+    else:
+        existing_indexes = {
+            index["name"] for index in inspector.get_indexes("transactions")
+        }
+        for name in LEGACY_TRANSACTION_INDEXES:
+            if name in existing_indexes:
+                op.drop_index(name, table_name="transactions")
+    for name, columns in TRANSACTION_INDEXES.items():
+        if name not in existing_indexes:
+            op.create_index(name, "transactions", columns)
+
+    if "transaction_daily_rollups" not in tables:
+        op.create_table(
+            "transaction_daily_rollups",
+            sa.Column("user_id", sa.UUID(), nullable=False),
+            sa.Column("day", sa.Date(), nullable=False),
+            sa.Column("type", sa.String(length=50), nullable=False),
+            sa.Column("income", sa.Boolean(), nullable=False),
+            sa.Column("count", sa.Integer(), nullable=False),
+            sa.Column("total", sa.Numeric(precision=15, scale=2), nullable=False),
+            sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+            sa.PrimaryKeyConstraint("user_id", "day", "type", "income"),
+        )
+    _backfill_daily_rollups()
+
+    if "advice_cache" not in tables:
+        op.create_table(
+            "advice_cache",
+            sa.Column("user_id", sa.UUID(), nullable=False),
+            sa.Column("days", sa.Integer(), nullable=False),
+            sa.Column("output_format", sa.String(length=10), nullable=False),
+            sa.Column("fingerprint", sa.String(length=64), nullable=False),
+            sa.Column("content", sa.LargeBinary(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+            sa.PrimaryKeyConstraint("user_id", "days", "output_format", "fingerprint"),
+        )
+
+
+def _backfill_daily_rollups() -> None:
+    """Build rollups from existing transactions when the rollup table is empty."""
+    bind = op.get_bind()
+    transactions = sa.table(
+        "transactions",
+        sa.column("user_id"),
+        sa.column("time"),
+        sa.column("type"),
+        sa.column("income"),
+        sa.column("amount"),
+    )
+    rollups = sa.table(
+        "transaction_daily_rollups",
+        sa.column("user_id"),
+        sa.column("day"),
+        sa.column("type"),
+        sa.column("income"),
+        sa.column("count"),
+        sa.column("total"),
+    )
+    if bind.execute(sa.select(rollups.c.user_id).limit(1)).first() is not None:
+        return
+
+    if bind.dialect.name == "sqlite":
+        day = sa.func.date(transactions.c.time)
+    else:
+        day = sa.cast(transactions.c.time, sa.Date)
+    op.execute(
+        rollups.insert().from_select(
+            ["user_id", "day", "type", "income", "count", "total"],
+            sa.select(
+                transactions.c.user_id,
+                day,
+                transactions.c.type,
+                transactions.c.income,
+                sa.func.count(),
+                sa.func.sum(transactions.c.amount),
+            ).group_by(
+                transactions.c.user_id,
+                day,
+                transactions.c.type,
+                transactions.c.income,
+            ),
+        )
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("advice_cache")
+    op.drop_table("transaction_daily_rollups")
+    op.drop_table("transactions")
+    op.drop_index("ix_users_email", table_name="users")
+    op.drop_index("ix_users_username", table_name="users")
+    op.drop_table("users")
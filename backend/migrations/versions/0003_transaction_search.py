@@ -0,0 +1,87 @@
+"""Transaction description search
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 00:00:00
+
+Postgres gets a GIN index on the descriptions' tsvector. SQLite gets an FTS5
+table over the descriptions plus transactions_fts_ids, which maps the FTS
+rowids to transaction ids; searches join on the id. Its INTEGER PRIMARY KEY
+keeps those rowids stable across VACUUM. Triggers on transactions keep both
+in step. Recreating transactions in batch mode drops the triggers; such a
+migration has to run SQLITE_TRIGGERS again (and, to be safe, SQLITE_REBUILD).
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Transaction ids are stored as the raw column value, so they compare equal to
+# transactions.id in joins
+SQLITE_TABLES = [
+    "CREATE VIRTUAL TABLE transactions_fts USING fts5(description)",
+    "CREATE TABLE transactions_fts_ids ("
+    "rowid INTEGER PRIMARY KEY, transaction_id CHAR(32) NOT NULL UNIQUE)",
+]
+SQLITE_TRIGGERS = [
+    "CREATE TRIGGER transactions_fts_insert AFTER INSERT ON transactions BEGIN "
+    "INSERT INTO transactions_fts_ids(transaction_id) VALUES (new.id); "
+    "INSERT INTO transactions_fts(rowid, description) "
+    "SELECT rowid, new.description FROM transactions_fts_ids "
+    "WHERE transaction_id = new.id; END",
+    "CREATE TRIGGER transactions_fts_delete AFTER DELETE ON transactions BEGIN "
+    "DELETE FROM transactions_fts WHERE rowid = "
+    "(SELECT rowid FROM transactions_fts_ids WHERE transaction_id = old.id); "
+    "DELETE FROM transactions_fts_ids WHERE transaction_id = old.id; END",
+    "CREATE TRIGGER transactions_fts_update AFTER UPDATE OF description "
+    "ON transactions BEGIN "
+    "UPDATE transactions_fts SET description = new.description WHERE rowid = "
+    "(SELECT rowid FROM transactions_fts_ids WHERE transaction_id = new.id); END",
+]
+# Rebuild the index from transactions
+SQLITE_REBUILD = [
+    "DELETE FROM transactions_fts",
+    "DELETE FROM transactions_fts_ids",
+    "INSERT INTO transactions_fts_ids(transaction_id) SELECT id FROM transactions",
+    "INSERT INTO transactions_fts(rowid, description) "
+    "SELECT i.rowid, t.description FROM transactions_fts_ids i "
+    "JOIN transactions t ON t.id = i.transaction_id",
+]
+SQLITE_DOWNGRADE = [
+    "DROP TRIGGER transactions_fts_update",
+    "DROP TRIGGER transactions_fts_delete",
+    "DROP TRIGGER transactions_fts_insert",
+    "DROP TABLE transactions_fts_ids",
+    "DROP TABLE transactions_fts",
+]
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        op.create_index(
+            "ix_transactions_description_fts",
+            "transactions",
+            [sa.text("to_tsvector('simple', description)")],
+            postgresql_using="gin",
+        )
+    elif dialect == "sqlite":
+        for statement in SQLITE_TABLES + SQLITE_TRIGGERS + SQLITE_REBUILD:
+            op.execute(statement)
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        op.drop_index("ix_transactions_description_fts", table_name="transactions")
+    elif dialect == "sqlite":
+        for statement in SQLITE_DOWNGRADE:
+            op.execute(statement)
@@ -0,0 +1,35 @@
+"""SQLite transaction times with microseconds
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 00:00:00
+
+Transactions created under the old func.now() default were stored by SQLite as
+'YYYY-MM-DD HH:MM:SS', while SQLAlchemy stores and binds datetimes as
+'YYYY-MM-DD HH:MM:SS.ffffff'. SQLite compares them as text, so keyset cursors
+taken from such rows repeated them on the next page. Rewrite them into
+SQLAlchemy's format; the values are unchanged, so downgrade does nothing.
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == "sqlite":
+        op.execute(
+            "UPDATE transactions SET time = time || '.000000' "
+            "WHERE length(time) = 19"
+        )
+
+
+def downgrade() -> None:
+    pass
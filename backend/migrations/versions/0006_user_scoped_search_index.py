@@ -0,0 +1,48 @@
+"""User-scoped transaction search index
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 00:00:00
+
+Replaces the Postgres GIN index on the descriptions' tsvector with one on
+(user_id, tsvector), using btree_gin for the uuid column. A search then only
+reads the searching user's matches instead of every user's. SQLite keeps its
+FTS5 table from migration 0003. Downgrade leaves the extension installed.
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TSVECTOR = sa.text("to_tsvector('simple', description)")
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("CREATE EXTENSION IF NOT EXISTS btree_gin")
+        op.drop_index("ix_transactions_description_fts", table_name="transactions")
+        op.create_index(
+            "ix_transactions_user_description_fts",
+            "transactions",
+            [sa.text("user_id"), TSVECTOR],
+            postgresql_using="gin",
+        )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        op.drop_index("ix_transactions_user_description_fts", table_name="transactions")
+        op.create_index(
+            "ix_transactions_description_fts",
+            "transactions",
+            [TSVECTOR],
+            postgresql_using="gin",
+        )